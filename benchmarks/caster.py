@@ -0,0 +1,84 @@
+"""Stand-in NTRIP caster on localhost with configurable latency and bandwidth."""
+
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PROTOCOL_HTTP09 = "HTTP/0.9"
+PROTOCOL_HTTP11 = "HTTP/1.1"
+CHUNK_SIZE = 16 * 1024
+
+
+class StandInCaster(ThreadingHTTPServer):
+    """Caster answering every path with `sourcetable`.
+
+    With `HTTP/0.9` the sourcetable is sent as NTRIP 1.0 casters do, without
+    a status line and headers, and the connection is closed. With `HTTP/1.1`
+    it is sent with `Content-Length` and the connection is kept alive.
+    `latency` seconds pass before the first byte, `bandwidth` limits the
+    bytes per second sent to every connection.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, sourcetable, protocol=PROTOCOL_HTTP11, latency=0, bandwidth=None):
+        super().__init__(("127.0.0.1", 0), StandInCasterHandler)
+        self.sourcetable = sourcetable
+        self.protocol = protocol
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+    @property
+    def host(self):
+        return self.server_address[0]
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def handle_error(self, request, client_address):
+        # clients closing connections early, e.g. TLS probes of the https url variants, are not errors here
+        pass
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.shutdown()
+        self.server_close()
+
+
+class StandInCasterHandler(BaseHTTPRequestHandler):
+    protocol_version = PROTOCOL_HTTP11
+    # responses are written in one piece, otherwise delayed ACKs stall reused connections
+    wbufsize = -1
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        if self.server.protocol == PROTOCOL_HTTP09:
+            self.close_connection = True
+        else:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain")
+            self.send_header("Content-Length", str(len(self.server.sourcetable)))
+            self.end_headers()
+        self._send(self.server.sourcetable)
+
+    def _send(self, body):
+        if not self.server.bandwidth:
+            self.wfile.write(body)
+            return
+        self.wfile.flush()
+        started = time.monotonic()
+        for offset in range(0, len(body), CHUNK_SIZE):
+            self.wfile.write(body[offset : offset + CHUNK_SIZE])
+            self.wfile.flush()
+            delay = started + (offset + CHUNK_SIZE) / self.server.bandwidth - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+    def log_message(self, *args):
+        pass
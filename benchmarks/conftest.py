@@ -0,0 +1,56 @@
+import tracemalloc
+from pathlib import Path
+
+import pytest
+
+try:
+    import pytest_benchmark
+except ImportError:
+    pytest_benchmark = None
+
+BENCHMARKS_DIRECTORY = Path(__file__).parent.resolve()
+
+
+def pytest_ignore_collect(collection_path, config):
+    """Collect benchmarks only when they are asked for, e.g. `pytest benchmarks`,
+    so that running the whole test suite stays fast. Benchmarks need pytest-benchmark."""
+    if collection_path.suffix != ".py" or not collection_path.name.startswith("test_"):
+        return None
+    if pytest_benchmark is None:
+        return True
+    requested = [Path(arg.split("::")[0]).resolve() for arg in config.args]
+    if not any(path == BENCHMARKS_DIRECTORY or BENCHMARKS_DIRECTORY in path.parents for path in requested):
+        return True
+    return None
+
+
+def peak_memory(function):
+    """Return peak memory in bytes allocated by a call of `function`."""
+    tracemalloc.start()
+    try:
+        function()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture
+def measure(benchmark):
+    """Benchmark `function` and record its peak memory in the benchmark `extra_info`."""
+
+    def run(function, rounds=None):
+        if rounds is None:
+            result = benchmark(function)
+        else:
+            result = benchmark.pedantic(function, rounds=rounds, warmup_rounds=1)
+        benchmark.extra_info["peak_memory_mb"] = round(peak_memory(function) / 1024 / 1024, 2)
+        return result
+
+    return run
+
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_benchmark_update_json(config, benchmarks, output_json):
+    """Keep the statistics of saved runs only, the timing of every round makes the committed baseline huge."""
+    for benchmark in output_json["benchmarks"]:
+        benchmark["stats"].pop("data", None)
@@ -0,0 +1,53 @@
+"""Import time budget of the `ntripbrowser` console script.
+
+Imports `ntripbrowser.browser` in fresh interpreters with `-X importtime`
+and fails when the best cumulative import time exceeds the budget or when
+any of the dependencies which must be imported lazily has been loaded.
+
+    python benchmarks/import_time.py [budget in ms]
+"""
+
+import subprocess
+import sys
+
+MODULE = "ntripbrowser.browser"
+BUDGET_MS = 150
+RUNS = 5
+LAZY_MODULES = ("asyncio", "cchardet", "geopy", "numpy", "pager", "pyarrow", "pydoc")
+
+
+def import_time(module):
+    """Return cumulative import time of `module` in microseconds and the names of all imported modules."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imported, cumulative = set(), None
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative_us, name = line.split("|")
+        if not cumulative_us.strip().isdigit():
+            continue
+        name = name.strip()
+        imported.add(name)
+        if name == module:
+            cumulative = int(cumulative_us)
+    return cumulative, imported
+
+
+def main():
+    budget_ms = float(sys.argv[1]) if len(sys.argv) > 1 else BUDGET_MS
+    runs = [import_time(MODULE) for _ in range(RUNS)]
+    best_ms = min(cumulative for cumulative, _ in runs) / 1000
+    loaded = sorted({name.split(".")[0] for _, imported in runs for name in imported} & set(LAZY_MODULES))
+    print(f"{MODULE}: {best_ms:.1f} ms (budget {budget_ms:.0f} ms)")
+    if loaded:
+        print(f"imported eagerly: {', '.join(loaded)}")
+    return 1 if best_ms > budget_ms or loaded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
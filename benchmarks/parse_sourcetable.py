@@ -0,0 +1,67 @@
+"""Micro-benchmark of sourcetable parsing on a synthetic sourcetable.
+
+Compares time and peak memory of the single-pass tokenizer of
+`NtripBrowser` with the previous approach, which collected STR/CAS/NET
+lines into three lists first and split them into rows in a second pass.
+
+    python benchmarks/parse_sourcetable.py [size in MB]
+"""
+
+import sys
+import timeit
+import tracemalloc
+
+from synthetic import synthetic_sourcetable
+
+from ntripbrowser import NtripBrowser
+from ntripbrowser.constants import CAS_HEADERS, NET_HEADERS, STR_HEADERS
+
+
+def two_pass_parse(raw_data):
+    data = raw_data.decode()
+    str_list, cas_list, net_list = [], [], []
+    for row in data.splitlines():
+        if row.startswith("STR"):
+            str_list.append(row)
+        elif row.startswith("CAS"):
+            cas_list.append(row)
+        elif row.startswith("NET"):
+            net_list.append(row)
+    return {
+        table: [dict(zip(headers, line.split(";", len(headers))[1:])) for line in lines]
+        for table, headers, lines in (
+            ("str", STR_HEADERS, str_list),
+            ("cas", CAS_HEADERS, cas_list),
+            ("net", NET_HEADERS, net_list),
+        )
+    }
+
+
+def best_of(function, repeat=15):
+    return min(timeit.repeat(function, "gc.enable()", number=1, repeat=repeat))
+
+
+def peak_memory(function):
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    size = float(sys.argv[1]) if len(sys.argv) > 1 else 5
+    raw_data = synthetic_sourcetable(int(size * 1024 * 1024))
+    print(f"{len(raw_data) / 1024 / 1024:.1f} MB, {raw_data.count(b'STR;')} STR rows")
+
+    parsers = {"two-pass, dict": two_pass_parse}
+    for row_format in ("dict", "record"):
+        parsers[f"single-pass, {row_format}"] = NtripBrowser("localhost", row_format=row_format)._parse_raw_data
+    for name, parse in parsers.items():
+        seconds = best_of(lambda parse=parse: parse(raw_data))
+        peak = peak_memory(lambda parse=parse: parse(raw_data))
+        print(f"{name:<20} {seconds * 1000:8.1f} ms {peak / 1024 / 1024:8.1f} MB peak")
+
+
+if __name__ == "__main__":
+    main()
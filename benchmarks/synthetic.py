@@ -0,0 +1,61 @@
+"""Synthetic sourcetables for benchmarks.
+
+Every 100th record is a CAS or a NET one, the rest are STR records with
+coordinates spread over the globe.
+"""
+
+import itertools
+
+STR_LINE = (
+    "STR;MP{index};Station {index};RTCM 3.2;1004(1),1005(10),1074(1),1084(1),1094(1);2;GPS+GLO+GAL;NET;FIN;"
+    "{latitude:.2f};{longitude:.2f};1;0;sNTRIP;none;B;N;9600;misc"
+)
+CAS_LINE = "CAS;caster{index}.example.com;2101;Caster{index};Operator;0;FIN;60.17;24.94;;0;http://example.com"
+NET_LINE = "NET;Net{index};Operator;B;N;http://example.com;http://example.com/str;http://example.com/reg;none"
+SOURCETABLE_ROWS = (100, 1000, 10000, 100000)
+HEADER_LINES = ["SOURCETABLE 200 OK", "Server: NTRIP Caster", ""]
+FOOTER_LINE = "ENDSOURCETABLE"
+
+
+def record_lines():
+    for index in itertools.count():
+        if index % 100 == 0:
+            yield CAS_LINE.format(index=index) if index % 200 else NET_LINE.format(index=index)
+        else:
+            yield STR_LINE.format(index=index, latitude=index % 180 - 90, longitude=index % 360 - 180)
+
+
+def synthetic_sourcetable(size):
+    """Return a sourcetable of about `size` bytes."""
+    lines, length = [], 0
+    for line in record_lines():
+        if length >= size:
+            break
+        lines.append(line)
+        length += len(line) + 2
+    return _join(lines)
+
+
+def synthetic_sourcetable_rows(str_rows):
+    """Return a sourcetable with `str_rows` STR records."""
+    lines, count = [], 0
+    for line in record_lines():
+        if count >= str_rows:
+            break
+        lines.append(line)
+        count += line.startswith("STR")
+    return _join(lines)
+
+
+def _join(lines):
+    return "\r\n".join([*HEADER_LINES, *lines, FOOTER_LINE]).encode()
+
+
+_sourcetables = {}
+
+
+def sourcetable(str_rows):
+    """Return `synthetic_sourcetable_rows(str_rows)`, every size is generated once."""
+    if str_rows not in _sourcetables:
+        _sourcetables[str_rows] = synthetic_sourcetable_rows(str_rows)
+    return _sourcetables[str_rows]
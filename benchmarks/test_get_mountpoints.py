@@ -0,0 +1,21 @@
+"""`NtripBrowser.get_mountpoints` end to end against a stand-in caster on localhost."""
+
+import pytest
+from caster import PROTOCOL_HTTP09, PROTOCOL_HTTP11, StandInCaster
+from synthetic import sourcetable
+
+from ntripbrowser import NtripBrowser
+
+# (latency in seconds, bandwidth in bytes per second)
+NETWORKS = {"local": (0, None), "wan": (0.05, 8 * 1024 * 1024)}
+
+
+@pytest.mark.parametrize("network", NETWORKS)
+@pytest.mark.parametrize("protocol", [PROTOCOL_HTTP09, PROTOCOL_HTTP11])
+@pytest.mark.parametrize("str_rows", [1000, 100000])
+def test_get_mountpoints(measure, str_rows, protocol, network):
+    latency, bandwidth = NETWORKS[network]
+    with StandInCaster(sourcetable(str_rows), protocol, latency, bandwidth) as caster:
+        ntrip_browser = NtripBrowser(caster.host, caster.port, timeout=60)
+        result = measure(ntrip_browser.get_mountpoints, rounds=3)
+    assert len(result["str"]) == str_rows
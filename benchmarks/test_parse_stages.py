@@ -0,0 +1,53 @@
+"""Stages of `NtripBrowser._process_raw_data` on synthetic sourcetables."""
+
+import pytest
+from synthetic import SOURCETABLE_ROWS, sourcetable
+
+from ntripbrowser import NtripBrowser
+
+COORDINATES = (60.17, 24.94)
+MAXDIST_KM = 500
+
+
+def browser(**options):
+    return NtripBrowser("localhost", **options)
+
+
+@pytest.mark.parametrize("str_rows", SOURCETABLE_ROWS)
+def test_decode(measure, str_rows):
+    raw_data = sourcetable(str_rows)
+    ntrip_browser = browser()
+    measure(lambda: ntrip_browser._decode_data(raw_data, ("localhost", 2101)))
+
+
+@pytest.mark.parametrize("row_format", ["dict", "record"])
+@pytest.mark.parametrize("str_rows", SOURCETABLE_ROWS)
+def test_parse(measure, str_rows, row_format):
+    text = sourcetable(str_rows).decode()
+    ntrip_browser = browser(row_format=row_format)
+    result = measure(lambda: ntrip_browser._form_ntrip_entries(text))
+    assert len(result["str"]) == str_rows
+
+
+@pytest.mark.parametrize("distance_mode", ["geodesic", "fast"])
+@pytest.mark.parametrize("str_rows", SOURCETABLE_ROWS)
+def test_locate(measure, str_rows, distance_mode):
+    ntrip_browser = browser(coordinates=COORDINATES, maxdist=MAXDIST_KM, distance_mode=distance_mode)
+    ntrip_dictionary = ntrip_browser._parse_raw_data(sourcetable(str_rows))
+    # rows only get their `Distance` updated, so the same rows are located in every round
+    measure(lambda: ntrip_browser._locate(ntrip_dictionary))
+
+
+@pytest.mark.parametrize("str_rows", SOURCETABLE_ROWS)
+def test_export_numpy(measure, str_rows):
+    pytest.importorskip("numpy")
+    ntrip_browser = browser(row_format="numpy")
+    ntrip_dictionary = ntrip_browser._parse_raw_data(sourcetable(str_rows))
+    measure(lambda: ntrip_browser._export(ntrip_dictionary))
+
+
+@pytest.mark.parametrize("str_rows", SOURCETABLE_ROWS)
+def test_process_raw_data(measure, str_rows):
+    raw_data = sourcetable(str_rows)
+    ntrip_browser = browser(coordinates=COORDINATES, maxdist=MAXDIST_KM)
+    measure(lambda: ntrip_browser._process_raw_data(raw_data))
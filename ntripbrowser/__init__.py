@@ -1,14 +1,78 @@
+import importlib
+
 from .constants import CAS_HEADERS, NET_HEADERS, STR_HEADERS
-from .exceptions import ExceededTimeoutError, NoDataReceivedFromCaster, NtripbrowserError, UnableToConnect
-from .ntripbrowser import NtripBrowser
+from .exceptions import (
+    CircuitOpenError,
+    ExceededTimeoutError,
+    NoDataReceivedFromCaster,
+    NtripbrowserError,
+    ResponseTooLargeError,
+    UnableToConnect,
+)
+
+# the rest of the API is imported on first access, so that importing the
+# package (and starting the CLI) does not load asyncio, geopy or NumPy
+_LAZY_IMPORTS = {
+    "NtripBrowser": ".ntripbrowser",
+    "AsyncNtripBrowser": ".async_ntripbrowser",
+    "EndpointCache": ".endpoints",
+    "ResponseCache": ".cache",
+    "MemoryCacheBackend": ".cache",
+    "FileCacheBackend": ".cache",
+    "ParseMemo": ".memo",
+    "MountpointIndex": ".index",
+    "CurlPool": ".pool",
+    "CurlShareCache": ".share",
+    "default_share": ".share",
+    "WatchEvent": ".watch",
+    "CasterScheduler": ".scheduler",
+    "FetchStats": ".stats",
+    "ResponseLimits": ".buffers",
+    "NtripRecord": ".records",
+    "StrRecord": ".records",
+    "CasRecord": ".records",
+    "NetRecord": ".records",
+}
 
 __all__ = [
     "NtripBrowser",
+    "AsyncNtripBrowser",
+    "EndpointCache",
+    "ResponseCache",
+    "MemoryCacheBackend",
+    "FileCacheBackend",
+    "ParseMemo",
+    "MountpointIndex",
+    "CurlPool",
+    "CurlShareCache",
+    "default_share",
+    "WatchEvent",
+    "CasterScheduler",
+    "FetchStats",
+    "ResponseLimits",
+    "NtripRecord",
+    "StrRecord",
+    "CasRecord",
+    "NetRecord",
     "NtripbrowserError",
     "ExceededTimeoutError",
     "NoDataReceivedFromCaster",
     "UnableToConnect",
+    "CircuitOpenError",
+    "ResponseTooLargeError",
     "STR_HEADERS",
     "NET_HEADERS",
     "CAS_HEADERS",
 ]
+
+
+def __getattr__(name):
+    if name not in _LAZY_IMPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_IMPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_IMPORTS))
@@ -0,0 +1,357 @@
+import asyncio
+import concurrent.futures
+import functools
+import logging
+import socket
+import ssl
+import time
+from urllib.parse import urlsplit
+
+from .buffers import UNLIMITED
+from .constants import (
+    ASYNC_READ_SIZE,
+    ASYNC_USER_AGENT,
+    PARSE_EXECUTOR_MIN_SIZE,
+    PYCURL_CONNECTION_FAILED_ERRNO,
+    PYCURL_COULD_NOT_RESOLVE_HOST_ERRNO,
+    PYCURL_TIMEOUT_ERRNO,
+    PYCURL_WRITE_ERRNO,
+    RESPONSE_ABORT_NOT_SOURCETABLE,
+    WATCH_JITTER,
+)
+from .exceptions import NoDataReceivedFromCaster, NtripbrowserError
+from .ntripbrowser import NtripBrowser, fetch_failure_error
+from .stats import FetchStats
+from .watch import diff_snapshots, poll_times, take_snapshot
+
+logger = logging.getLogger(__name__)
+
+
+class _ResponseAborted(Exception):
+    """The response buffer has refused the data, see `ResponseBuffer.abort_reason`."""
+
+
+@functools.cache
+def _ssl_context():
+    """Return the TLS context of https requests, CA certificates are loaded only once."""
+    return ssl.create_default_context()
+
+
+class AsyncDataFetcher:
+    """Fetch data from specified urls through the asyncio event loop.
+
+    All urls are requested concurrently, the first response accepted by
+    `parser_method` wins and the remaining requests are cancelled.
+    Responses are read with a minimal HTTP client, which accepts both
+    HTTP/1.x responses and NTRIP 1.0 (HTTP/0.9 like) ones, into buffers
+    checked against `response_limits`.
+    Responses which `parse_submitter` does not take are parsed in place
+    when they are smaller than `parse_threshold` bytes, larger ones in the
+    default executor of the loop, so that parsing does not block the loop.
+    Failure reasons are reported in the same way as `DataFetcher` does.
+
+    Parameters
+    ----------
+    urls : [str, str, ...]
+        URL's to fetch data from.
+    timeout : float
+        Seconds a request may take.
+    parser_method : callable
+        Custom callback to be executed on fetched from url's results.
+    parse_threshold : int
+        Size in bytes from which responses are parsed off the loop.
+    stats : FetchStats or None
+        Stats to record the winning url and its timings into.
+    parse_submitter : callable or None
+        See `DataFetcher`.
+    response_limits : ResponseLimits or None
+        Limits of the response buffers, requests breaking them are cancelled.
+
+    Attributes
+    ----------
+    urls_processed, results, winning_url, latency
+        See `DataFetcher`, connect time of `latency` is always None.
+    """
+
+    def __init__(
+        self,
+        urls,
+        timeout,
+        parser_method,
+        parse_threshold=PARSE_EXECUTOR_MIN_SIZE,
+        stats=None,
+        parse_submitter=None,
+        response_limits=None,
+    ):
+        self.urls = urls
+        self.timeout = timeout
+        self.parse_threshold = parse_threshold
+        self.stats = stats
+        self.parse_submitter = parse_submitter
+        self.response_limits = response_limits
+        self._parser_method = parser_method
+        self.urls_processed = []
+        self.results = None
+        self.winning_url = None
+        self.latency = None
+        self._buffers = {}
+        self._failures = []
+
+    async def fetch(self):
+        self.urls_processed = []
+        self.results = None
+        self.winning_url = None
+        self.latency = None
+        self._failures = []
+        self._buffers = {url: (self.response_limits or UNLIMITED).buffer() for url in self.urls}
+        tasks = {asyncio.ensure_future(self._request(url)): url for url in self.urls}
+        pending = set(tasks)
+        try:
+            while pending and not self.results:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    await self._process_finished_task(tasks[task], task)
+                    if self.results:
+                        break
+        finally:
+            for task in pending:
+                task.cancel()
+            # exceptions of the tasks finished along with the winner are retrieved as well
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self._close_buffers()
+        if not self.results:
+            logger.info("AsyncDataFetcher: No valid result is received")
+            raise fetch_failure_error(self.urls, self.urls_processed, self._failures)
+        return self.results
+
+    def _close_buffers(self):
+        for buffer in self._buffers.values():
+            buffer.close()
+        self._buffers = {}
+
+    async def _process_finished_task(self, url, task):
+        try:
+            raw_data, total_time = task.result()
+        except _ResponseAborted:
+            self._process_aborted_response(url)
+        except TimeoutError:
+            self._failures.append((url, PYCURL_TIMEOUT_ERRNO, "Timeout was reached"))
+        except socket.gaierror as error:
+            self._failures.append((url, PYCURL_COULD_NOT_RESOLVE_HOST_ERRNO, str(error)))
+        except (OSError, EOFError, ValueError) as error:
+            self._failures.append((url, PYCURL_CONNECTION_FAILED_ERRNO, str(error)))
+        else:
+            await self._process_response(url, raw_data, total_time)
+
+    def _process_aborted_response(self, url):
+        """Record the abort of `url`, responses aborted as no sourcetable count as processed."""
+        if self._buffers[url].abort_reason == RESPONSE_ABORT_NOT_SOURCETABLE:
+            logger.info('AsyncDataFetcher: Response from "%s" is no sourcetable, request is cancelled', url)
+            self.urls_processed.append(url)
+            return
+        logger.info('AsyncDataFetcher: Response from "%s" is too large, request is cancelled', url)
+        self._failures.append((url, PYCURL_WRITE_ERRNO, f"Response exceeds {self.response_limits.max_size} bytes"))
+
+    async def _process_response(self, url, raw_data, total_time):
+        self.urls_processed.append(url)
+        logger.info('AsyncDataFetcher: Trying to parse response from "%s"', url)
+        try:
+            self.results = await self._parse(raw_data)
+        except NoDataReceivedFromCaster:
+            self.results = None
+            logger.info('AsyncDataFetcher: No valid data found in response from "%s"', url)
+            return
+        self.winning_url = url
+        self.latency = (None, total_time)
+        if self.stats is not None:
+            self.stats.url = url
+            self.stats.total_time = total_time
+            self.stats.size_download = len(raw_data)
+        logger.info('AsyncDataFetcher: Results from "%s" is processed successfully', url)
+
+    async def _parse(self, raw_data):
+        future = self.parse_submitter(raw_data) if self.parse_submitter is not None else None
+        if future is not None:
+            try:
+                return await asyncio.wrap_future(future)
+            except concurrent.futures.BrokenExecutor:
+                logger.warning("AsyncDataFetcher: Parse executor is broken, parsing in the loop executor")
+        elif len(raw_data) < self.parse_threshold:
+            return self._parser_method(raw_data)
+        return await asyncio.get_running_loop().run_in_executor(None, self._parser_method, raw_data)
+
+    async def _request(self, url):
+        started = time.monotonic()
+        raw_data = await asyncio.wait_for(self._get(url), self.timeout)
+        return raw_data, time.monotonic() - started
+
+    async def _get(self, url):
+        parts = urlsplit(url)
+        ssl_context = _ssl_context() if parts.scheme == "https" else None
+        reader, writer = await asyncio.open_connection(parts.hostname, parts.port, ssl=ssl_context)
+        try:
+            writer.write(self._compose_request(parts))
+            await writer.drain()
+            return await self._read_response(reader, self._buffers[url])
+        finally:
+            writer.close()
+
+    @staticmethod
+    def _compose_request(parts):
+        request_lines = [
+            f"GET {parts.path or '/'} HTTP/1.1",
+            f"Host: {parts.netloc}",
+            f"User-Agent: {ASYNC_USER_AGENT}",
+            "Accept: */*",
+            "Connection: close",
+        ]
+        return ("\r\n".join(request_lines) + "\r\n\r\n").encode("ascii")
+
+    async def _read_response(self, reader, buffer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as error:
+            self._write(buffer, error.partial)
+            return buffer.getvalue()
+        except asyncio.LimitOverrunError:
+            head = b""
+        if not head.startswith(b"HTTP/"):
+            self._write(buffer, head)
+            await self._read_to_end(reader, buffer)
+            return buffer.getvalue()
+
+        headers = self._parse_headers(head)
+        if "chunked" in headers.get("transfer-encoding", ""):
+            await self._read_chunked(reader, buffer)
+        elif "content-length" in headers:
+            await self._read_exactly(reader, buffer, int(headers["content-length"]))
+        else:
+            await self._read_to_end(reader, buffer)
+        return buffer.getvalue()
+
+    @staticmethod
+    def _parse_headers(head):
+        headers = {}
+        for line in head.decode("latin-1").split("\r\n")[1:]:
+            name, _, value = line.partition(":")
+            if value:
+                headers[name.strip().lower()] = value.strip().lower()
+        return headers
+
+    @staticmethod
+    def _write(buffer, data):
+        if data and buffer.write(data) == 0:
+            raise _ResponseAborted(buffer.abort_reason)
+
+    async def _read_to_end(self, reader, buffer):
+        while chunk := await reader.read(ASYNC_READ_SIZE):
+            self._write(buffer, chunk)
+
+    async def _read_exactly(self, reader, buffer, size):
+        while size > 0:
+            chunk = await reader.read(min(size, ASYNC_READ_SIZE))
+            if not chunk:
+                raise asyncio.IncompleteReadError(b"", size)
+            self._write(buffer, chunk)
+            size -= len(chunk)
+
+    async def _read_chunked(self, reader, buffer):
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            if not size:
+                return
+            await self._read_exactly(reader, buffer, size)
+            await reader.readexactly(2)
+
+
+class AsyncNtripBrowser(NtripBrowser):
+    """`NtripBrowser` with awaitable `get_mountpoints`.
+
+    Requests share the running event loop instead of blocking on
+    `pycurl.CurlMulti`, so many lookups can run concurrently in one thread.
+    Sourcetables of at least `parse_threshold` bytes are parsed in
+    `parse_executor`, or in the default executor of the loop without it.
+    The curl specific `stagger_delay`, `response_cache`, `curl_pool` and
+    `curl_share` are not supported, nor are the blocking `iter_mountpoints`
+    and `get_mountpoints_many`, gather `get_mountpoints` of many browsers instead.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = {
+            "stagger_delay": self._fetcher.stagger_delay,
+            "response_cache": self.response_cache,
+            "curl_pool": self.curl_pool,
+            "curl_share": self.curl_share,
+        }
+        unsupported = [name for name, value in options.items() if value is not None]
+        if unsupported:
+            raise TypeError(f"AsyncNtripBrowser does not support {', '.join(unsupported)}")
+
+    async def get_mountpoints(self):
+        if self.scheduler is not None:
+            self.scheduler.check(self.host, self.port)
+        try:
+            fetcher = await self._get_mountpoints()
+        except NtripbrowserError as error:
+            if self.scheduler is not None:
+                self._record_outcome(self.host, self.port, None, error)
+            raise
+        if self.scheduler is not None:
+            self._record_outcome(self.host, self.port, fetcher, fetcher.results)
+        return fetcher.results
+
+    async def _get_mountpoints(self):
+        known_url = self._known_url(self.host, self.port)
+        if known_url:
+            try:
+                return await self._fetch_mountpoints([known_url])
+            except NtripbrowserError:
+                logger.info('AsyncNtripBrowser: Known url "%s" failed, trying all of the urls', known_url)
+                self.endpoint_cache.forget(self.host, self.port)
+        return await self._fetch_mountpoints(self._preferred_urls())
+
+    async def _fetch_mountpoints(self, urls):
+        """Return the fetcher which has fetched the sourcetable from one of `urls`."""
+        caster = (self.host, self.port)
+        stats = FetchStats(caster)
+        fetcher = AsyncDataFetcher(
+            urls,
+            self._timeouts(*caster)[1],
+            functools.partial(self._process_raw_data, caster=caster, stats=stats),
+            self.parse_threshold,
+            stats=stats,
+            parse_submitter=functools.partial(self._submit_parse, caster=caster, stats=stats),
+            response_limits=self.response_limits,
+        )
+        try:
+            await fetcher.fetch()
+        except NtripbrowserError as error:
+            stats.error = error
+            raise
+        finally:
+            self._report_stats(stats)
+        self.winning_url = fetcher.winning_url
+        if self.endpoint_cache is not None:
+            self.endpoint_cache.set(self.host, self.port, self.winning_url)
+        return fetcher
+
+    async def watch(self, interval, jitter=WATCH_JITTER):
+        """Asynchronous generator of the sourcetable changes, see `NtripBrowser.watch`."""
+        snapshot = {}
+        for poll_time in poll_times(interval, jitter):
+            await asyncio.sleep(max(0, poll_time - time.monotonic()))
+            try:
+                current = take_snapshot(await self.get_mountpoints())
+            except NtripbrowserError as error:
+                logger.warning("AsyncNtripBrowser: Polling %s:%s failed: %r", self.host, self.port, error)
+                continue
+            for event in diff_snapshots(snapshot, current):
+                yield event
+            snapshot = current
+
+    def iter_mountpoints(self):
+        raise TypeError("AsyncNtripBrowser does not support iter_mountpoints, await get_mountpoints instead")
+
+    def get_mountpoints_many(self, casters, max_connections=None):
+        raise TypeError("AsyncNtripBrowser does not support get_mountpoints_many, gather get_mountpoints instead")
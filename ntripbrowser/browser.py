@@ -1,20 +1,25 @@
 import argparse
-import pydoc
-
-import pager
-from texttable import Texttable
+import math
+import sys
 
+from .constants import NTRIP_TABLE_HEADERS, TABLE_CHUNK_SIZE
 from .ntripbrowser import (
-    CAS_HEADERS,
-    NET_HEADERS,
-    STR_HEADERS,
     ExceededTimeoutError,
     NoDataReceivedFromCaster,
     NtripBrowser,
+    ResponseTooLargeError,
     UnableToConnect,
 )
+from .output import WRITERS, default_columns, discard_stdout, event_columns, event_row, format_event
+from .render import pager_stream, render_table
+
+OUTPUT_FORMATS = ("table", *WRITERS)
+
 
-SCREEN_WIDTH = pager.getwidth()
+def get_screen_width():
+    import pager
+
+    return pager.getwidth()
 
 
 def argparser():
@@ -29,53 +34,105 @@ def argparser():
         help="Only report stations less than this number of km away from given coordinate",
         type=float,
     )
+    parser.add_argument(
+        "-f",
+        "--format",
+        choices=OUTPUT_FORMATS,
+        default="table",
+        help="Output format, json, jsonl and csv rows are written to stdout as they arrive",
+    )
+    parser.add_argument(
+        "--tables",
+        type=tables_list,
+        default=list(NTRIP_TABLE_HEADERS),
+        help="Comma separated tables to output, str,cas,net by default",
+    )
+    parser.add_argument("--columns", type=comma_separated, help="Comma separated columns to output")
+    parser.add_argument(
+        "-w",
+        "--watch",
+        type=positive_seconds,
+        metavar="SECONDS",
+        help="Poll the caster every SECONDS and output only added, removed and modified rows",
+    )
 
     return parser.parse_args()
 
 
-def display_ntrip_table(ntrip_table):
-    table_cas = compile_ntrip_table(ntrip_table["cas"], CAS_HEADERS)
-    table_net = compile_ntrip_table(ntrip_table["net"], NET_HEADERS)
-    table_str = compile_ntrip_table(ntrip_table["str"], STR_HEADERS)
-
-    pydoc.pager(
-        (
-            "CAS TABLE".center(SCREEN_WIDTH, "=")
-            + "\n"
-            + table_cas
-            + 4 * "\n"
-            + "NET TABLE".center(SCREEN_WIDTH, "=")
-            + "\n"
-            + table_net
-            + 4 * "\n"
-            + "STR TABLE".center(SCREEN_WIDTH, "=")
-            + "\n"
-            + table_str
-        )
-    )
-
+def comma_separated(value):
+    return [item.strip() for item in value.split(",") if item.strip()]
 
-def compile_ntrip_table(table, headers):
-    table_to_draw = Texttable(max_width=SCREEN_WIDTH)
-    for row in table:
-        row_to_draw = []
-        for header in headers:
-            try:
-                row_to_draw.append(row[header])
-            except KeyError:
-                row_to_draw.append(None)
-        table_to_draw.add_rows((headers, row_to_draw))
 
-    return table_to_string(table_to_draw)
+def tables_list(value):
+    tables = [table.lower() for table in comma_separated(value)]
+    unknown = [table for table in tables if table not in NTRIP_TABLE_HEADERS]
+    if unknown or not tables:
+        raise argparse.ArgumentTypeError(f"tables must be some of str,cas,net, got {value!r}")
+    return tables
 
 
-def table_to_string(table):
+def positive_seconds(value):
     try:
-        return str(table.draw()).center(SCREEN_WIDTH, " ")  # python3
-    except UnicodeEncodeError:
-        return table.draw().center(SCREEN_WIDTH, " ")  # python2
-    except TypeError:
-        return ""
+        seconds = float(value)
+    except ValueError:
+        seconds = math.nan
+    if not 0 < seconds < math.inf:
+        raise argparse.ArgumentTypeError(f"seconds must be a positive number, got {value!r}")
+    return seconds
+
+
+def display_ntrip_table(ntrip_table, tables=None, columns=None):
+    screen_width = get_screen_width()
+    selected_tables = [table for table in ("cas", "net", "str") if tables is None or table in tables]
+    with pager_stream() as stream:
+        for index, table in enumerate(selected_tables):
+            if index:
+                stream.write(4 * "\n")
+            stream.write(f"{table.upper()} TABLE".center(screen_width, "=") + "\n")
+            headers = columns or NTRIP_TABLE_HEADERS[table]
+            for line in render_table(ntrip_table[table], headers, screen_width, TABLE_CHUNK_SIZE):
+                stream.write(line + "\n")
+
+
+def stream_rows(browser, output_format, tables, columns=None, stream=None):
+    """Write rows of the selected `tables` to `stream` while the sourcetable is being downloaded."""
+    stream = stream or sys.stdout
+    if columns is None and output_format == "csv":
+        columns = default_columns(tables)
+    writer = WRITERS[output_format](stream, columns)
+    for table, row in browser.iter_mountpoints():
+        if table in tables:
+            writer.write(table, row)
+            stream.flush()
+    writer.close()
+
+
+def watch_rows(browser, output_format, tables, interval, columns=None, stream=None):
+    """Write changes of the selected `tables` to `stream` until interrupted.
+
+    The table format writes a line per change, the other ones write changed
+    rows with an `Event` field ("added", "removed" or "modified").
+    """
+    stream = stream or sys.stdout
+    writer = None
+    if output_format != "table":
+        if columns is None and output_format == "csv":
+            columns = event_columns(tables)
+        writer = WRITERS[output_format](stream, columns)
+    try:
+        for event in browser.watch(interval):
+            if event.table not in tables:
+                continue
+            if writer is None:
+                stream.write(format_event(event) + "\n")
+            else:
+                writer.write(event.table, event_row(event))
+            stream.flush()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if writer is not None:
+            writer.close()
 
 
 def main():
@@ -83,6 +140,10 @@ def main():
     browser = NtripBrowser(
         args.url, port=args.port, timeout=args.timeout, coordinates=args.coordinates, maxdist=args.maxdist
     )
+    if args.watch is not None:
+        return watch_mountpoints(browser, args)
+    if args.format != "table":
+        return stream_mountpoints(browser, args)
     try:
         ntrip_table = browser.get_mountpoints()
     except ExceededTimeoutError:
@@ -91,5 +152,40 @@ def main():
         print("Unable to connect to NTRIP caster")
     except NoDataReceivedFromCaster:
         print("No data received from NTRIP caster")
+    except ResponseTooLargeError:
+        print("NTRIP caster response is too large")
+    else:
+        display_ntrip_table(ntrip_table, args.tables, args.columns)
+
+
+def stream_mountpoints(browser, args):
+    try:
+        stream_rows(browser, args.format, args.tables, args.columns)
+    except ExceededTimeoutError:
+        print("Connection timed out", file=sys.stderr)
+    except UnableToConnect:
+        print("Unable to connect to NTRIP caster", file=sys.stderr)
+    except NoDataReceivedFromCaster:
+        print("No data received from NTRIP caster", file=sys.stderr)
+    except ResponseTooLargeError:
+        print("NTRIP caster response is too large", file=sys.stderr)
+    except BrokenPipeError:
+        discard_stdout()
+        return 0
     else:
-        display_ntrip_table(ntrip_table)
+        return 0
+    return 1
+
+
+def watch_mountpoints(browser, args):
+    from .endpoints import EndpointCache
+    from .pool import CurlPool
+
+    # polls go to the url which answered last time over a kept alive connection
+    browser.endpoint_cache = EndpointCache()
+    browser.curl_pool = CurlPool()
+    try:
+        watch_rows(browser, args.format, args.tables, args.watch, args.columns)
+    except BrokenPipeError:
+        discard_stdout()
+    return 0
@@ -0,0 +1,118 @@
+import logging
+import mmap
+import tempfile
+from io import BytesIO
+
+from .constants import (
+    RESPONSE_ABORT_NOT_SOURCETABLE,
+    RESPONSE_ABORT_TOO_LARGE,
+    RESPONSE_MAX_SIZE,
+    SOURCETABLE_MARKERS,
+    SOURCETABLE_SNIFF_SIZE,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class ResponseLimits:
+    """Limits of the memory a response may take while it is downloaded.
+
+    Parameters
+    ----------
+    max_size : int or None
+        Maximum response size in bytes, larger transfers are aborted as soon
+        as they exceed it. None for no limit.
+    spill_size : int or None
+        Responses larger than this number of bytes are moved to a temporary
+        file, which is memory-mapped for parsing. None to keep responses in memory.
+    sniff_size : int or None
+        Transfers which carry none of `SOURCETABLE_MARKERS` within this number
+        of first bytes, e.g. casters streaming RTCM instead of a sourcetable,
+        are aborted. None to accept any response.
+    """
+
+    def __init__(self, max_size=RESPONSE_MAX_SIZE, spill_size=None, sniff_size=SOURCETABLE_SNIFF_SIZE):
+        self.max_size = max_size
+        self.spill_size = spill_size
+        self.sniff_size = sniff_size
+
+    def buffer(self, consumer=None):
+        return ResponseBuffer(self, consumer)
+
+
+UNLIMITED = ResponseLimits(max_size=None, spill_size=None, sniff_size=None)
+
+
+class ResponseBuffer:
+    """Buffer of one response, to be written to by curl.
+
+    `write` returns 0 to make curl abort the transfer once the response
+    breaks `limits`, `abort_reason` tells why it was aborted then.
+    With `consumer` the data is passed on to it instead of being kept.
+    """
+
+    def __init__(self, limits, consumer=None):
+        self.limits = limits
+        self.consumer = consumer
+        self.size = 0
+        self.abort_reason = None
+        self._head = b"" if limits.sniff_size is not None else None
+        self._memory = BytesIO()
+        self._file = None
+        self._mmap = None
+
+    def write(self, data):
+        self.size += len(data)
+        if self.limits.max_size is not None and self.size > self.limits.max_size:
+            return self._abort(RESPONSE_ABORT_TOO_LARGE)
+        if self._head is not None and not self._sniff(data):
+            return self._abort(RESPONSE_ABORT_NOT_SOURCETABLE)
+        if self.consumer is not None:
+            return self.consumer(data)
+        if self._file is None and self.limits.spill_size is not None and self.size > self.limits.spill_size:
+            self._spill()
+        (self._memory if self._file is None else self._file).write(data)
+        return None
+
+    def _sniff(self, data):
+        """Return False when the first `sniff_size` bytes are known to be no sourcetable."""
+        self._head += data[: self.limits.sniff_size - len(self._head)]
+        if any(marker in self._head for marker in SOURCETABLE_MARKERS):
+            self._head = None
+            return True
+        return len(self._head) < self.limits.sniff_size
+
+    def _abort(self, reason):
+        self.abort_reason = reason
+        return 0
+
+    def _spill(self):
+        logger.debug("ResponseBuffer: Spilling response of over %d bytes to a file", self.limits.spill_size)
+        self._file = tempfile.TemporaryFile()  # noqa: SIM115 - closed with the buffer
+        self._file.write(self._memory.getbuffer())
+        self._memory = None
+
+    @property
+    def spilled(self):
+        return self._file is not None
+
+    def getvalue(self):
+        """Return the response, bytes or a read-only memory map of the file it was spilled to.
+
+        The memory map stays valid until the buffer is closed.
+        """
+        if self._file is None:
+            return self._memory.getvalue()
+        if self._mmap is None:
+            self._file.flush()
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._mmap
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._memory = None
@@ -0,0 +1,235 @@
+import contextlib
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+from .constants import RESPONSE_CACHE_MAX_AGE, RESPONSE_CACHE_MAX_RESULTS, RESPONSE_CACHE_MAX_SIZE
+
+logger = logging.getLogger(__name__)
+
+
+class CachedResponse:
+    """Sourcetable response stored in the `ResponseCache`.
+
+    Attributes
+    ----------
+    url : str
+    body : bytes
+    etag : str or None
+        Value of the `ETag` response header.
+    last_modified : str or None
+        Value of the `Last-Modified` response header.
+    stored_at : float
+        Time the response was received or last revalidated.
+    digest : str
+        Hash of the body, results parsed from it are kept under it.
+    """
+
+    def __init__(self, url, body, etag=None, last_modified=None, stored_at=None, digest=None):
+        self.url = url
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.stored_at = time.time() if stored_at is None else stored_at
+        self.digest = hashlib.blake2b(body, digest_size=16).hexdigest() if digest is None else digest
+
+    @property
+    def age(self):
+        return time.time() - self.stored_at
+
+    @property
+    def size(self):
+        return len(self.body)
+
+
+class MemoryCacheBackend:
+    """Keep cached responses in memory, evict least recently used ones
+    when the total size of bodies exceeds `max_size` bytes.
+    """
+
+    def __init__(self, max_size=RESPONSE_CACHE_MAX_SIZE):
+        self.max_size = max_size
+        self._lock = threading.Lock()
+        self._responses = OrderedDict()
+        self._size = 0
+
+    def get(self, url):
+        with self._lock:
+            response = self._responses.get(url)
+            if response is not None:
+                self._responses.move_to_end(url)
+            return response
+
+    def set(self, url, response):
+        with self._lock:
+            self._pop(url)
+            self._responses[url] = response
+            self._size += response.size
+            while self._size > self.max_size and self._responses:
+                self._pop(next(iter(self._responses)))
+
+    def delete(self, url):
+        with self._lock:
+            self._pop(url)
+
+    def _pop(self, url):
+        response = self._responses.pop(url, None)
+        if response is not None:
+            self._size -= response.size
+
+
+class FileCacheBackend:
+    """Keep cached responses in `directory`, evict least recently used ones
+    when the total size of bodies exceeds `max_size` bytes.
+    """
+
+    def __init__(self, directory, max_size=RESPONSE_CACHE_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url, extension):
+        return os.path.join(self.directory, hashlib.sha1(url.encode("utf8")).hexdigest() + extension)
+
+    def get(self, url):
+        try:
+            with open(self._path(url, ".json")) as meta_file:
+                meta = json.load(meta_file)
+            with open(self._path(url, ".body"), "rb") as body_file:
+                body = body_file.read()
+            os.utime(self._path(url, ".body"))
+            return CachedResponse(url, body, meta["etag"], meta["last_modified"], meta["stored_at"], meta.get("digest"))
+        except (OSError, ValueError, KeyError, TypeError):
+            # missing, partly written or otherwise corrupt entries are cache misses
+            return None
+
+    def set(self, url, response):
+        meta = {
+            "etag": response.etag,
+            "last_modified": response.last_modified,
+            "stored_at": response.stored_at,
+            "digest": response.digest,
+        }
+        try:
+            self._write(self._path(url, ".body"), response.body, "wb")
+            self._write(self._path(url, ".json"), json.dumps(meta), "w")
+        except OSError:
+            logger.warning('FileCacheBackend: Unable to store response from "%s"', url)
+            return
+        self._evict()
+
+    def delete(self, url):
+        for extension in (".body", ".json"):
+            try:
+                os.remove(self._path(url, extension))
+            except FileNotFoundError:
+                pass
+
+    def _write(self, path, data, mode):
+        with tempfile.NamedTemporaryFile(mode, dir=self.directory, delete=False) as cache_file:
+            try:
+                cache_file.write(data)
+                cache_file.close()
+                os.replace(cache_file.name, path)
+            except BaseException:
+                cache_file.close()
+                with contextlib.suppress(OSError):
+                    os.remove(cache_file.name)
+                raise
+
+    def _evict(self):
+        bodies = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".body"):
+                stat = entry.stat()
+                bodies.append((stat.st_mtime, stat.st_size, entry.path))
+        total_size = sum(size for _, size, _ in bodies)
+        for _, size, path in sorted(bodies):
+            if total_size <= self.max_size:
+                break
+            for extension_path in (path, path[: -len(".body")] + ".json"):
+                try:
+                    os.remove(extension_path)
+                except FileNotFoundError:
+                    pass
+            total_size -= size
+
+
+class ResponseCache:
+    """HTTP-level cache of sourcetable responses keyed by URL.
+
+    Responses younger than `max_age` seconds are used without any request
+    to the caster. Older ones are revalidated with `If-None-Match` and
+    `If-Modified-Since` headers when the caster sent `ETag` or `Last-Modified`,
+    so an unchanged sourcetable is answered with `304 Not Modified`.
+
+    Results parsed from cached responses are kept in memory as well, keyed
+    by the body hash and the parsing settings, so fresh and revalidated
+    responses are not parsed again. Such results are shared between calls
+    and must not be modified.
+
+    Parameters
+    ----------
+    backend : MemoryCacheBackend or FileCacheBackend or None
+        Storage for responses, `MemoryCacheBackend()` by default.
+    max_age : float
+    max_results : int
+        Maximum number of parsed results kept, least recently used ones are evicted.
+    """
+
+    def __init__(self, backend=None, max_age=RESPONSE_CACHE_MAX_AGE, max_results=RESPONSE_CACHE_MAX_RESULTS):
+        self.backend = MemoryCacheBackend() if backend is None else backend
+        self.max_age = max_age
+        self.max_results = max_results
+        self._lock = threading.Lock()
+        self._results = OrderedDict()
+
+    def get(self, url):
+        return self.backend.get(url)
+
+    def get_fresh(self, url):
+        response = self.backend.get(url)
+        if response is not None and response.age < self.max_age:
+            return response
+        return None
+
+    def store(self, url, body, headers):
+        response = CachedResponse(url, body, headers.get("etag"), headers.get("last-modified"))
+        self.backend.set(url, response)
+        return response
+
+    def revalidated(self, response):
+        response.stored_at = time.time()
+        self.backend.set(response.url, response)
+
+    def invalidate(self, url):
+        self.backend.delete(url)
+
+    def get_result(self, response, key):
+        """Return the result parsed from `response` with the settings `key` or None."""
+        with self._lock:
+            result = self._results.get((response.digest, key))
+            if result is not None:
+                self._results.move_to_end((response.digest, key))
+            return result
+
+    def set_result(self, response, key, result):
+        with self._lock:
+            self._results[(response.digest, key)] = result
+            self._results.move_to_end((response.digest, key))
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+
+    @staticmethod
+    def conditional_headers(response):
+        headers = []
+        if response.etag:
+            headers.append(f"If-None-Match: {response.etag}")
+        if response.last_modified:
+            headers.append(f"If-Modified-Since: {response.last_modified}")
+        return headers
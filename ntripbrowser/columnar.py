@@ -0,0 +1,103 @@
+"""Columnar export of sourcetable rows.
+
+Every table is turned into typed columns in one pass over its rows:
+
+- coordinates and `Distance` are float columns;
+- ports and `Bitrate` are integer columns;
+- flags (`Carrier`, `NMEA`, `Solution`, `Fee`) are 8-bit integer columns,
+  `Fee` being 1 for "Y" and 0 for "N";
+- the rest of the fields are string columns.
+
+Missing and invalid values are nulls in Arrow tables. NumPy structured
+arrays have no nulls, so NaN, -1 and None are used there for float,
+integer and string columns respectively.
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+from .distance import to_float
+
+FLOAT_COLUMNS = frozenset(("Latitude", "Longitude", "Distance"))
+INT_COLUMNS = frozenset(("Port", "FallbackPort", "Bitrate"))
+FLAG_COLUMNS = frozenset(("Carrier", "NMEA", "Solution", "Fee"))
+
+_FEE_FLAGS = {"N": 0, "Y": 1}
+
+
+def to_numpy(headers, rows):
+    """Return `rows` of a table with `headers` as a NumPy structured array."""
+    if numpy is None:
+        raise ImportError("numpy is required to export sourcetables as structured arrays")
+    array = numpy.empty(len(rows), dtype=[(header, _numpy_type(header)) for header in headers])
+    for header, values in _columns(headers, rows):
+        if header in FLOAT_COLUMNS:
+            values = [math.nan if value is None else value for value in values]
+        elif header in INT_COLUMNS or header in FLAG_COLUMNS:
+            values = [-1 if value is None else value for value in values]
+        array[header] = values
+    return array
+
+
+def to_arrow(headers, rows):
+    """Return `rows` of a table with `headers` as an Arrow table."""
+    if pyarrow is None:
+        raise ImportError("pyarrow is required to export sourcetables as Arrow tables")
+    return pyarrow.table(
+        {header: pyarrow.array(values, type=_arrow_type(header)) for header, values in _columns(headers, rows)}
+    )
+
+
+def _columns(headers, rows):
+    for header in headers:
+        values = [row.get(header) for row in rows]
+        if header in FLOAT_COLUMNS:
+            values = [to_float(value) for value in values]
+        elif header in INT_COLUMNS:
+            values = [_to_int(value) for value in values]
+        elif header == "Fee":
+            values = [_FEE_FLAGS.get(value) for value in values]
+        elif header in FLAG_COLUMNS:
+            values = [_to_flag(value) for value in values]
+        yield header, values
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _to_flag(value):
+    value = _to_int(value)
+    return value if value is not None and 0 <= value < 128 else None
+
+
+def _numpy_type(header):
+    if header in FLOAT_COLUMNS:
+        return numpy.float64
+    if header in INT_COLUMNS:
+        return numpy.int64
+    if header in FLAG_COLUMNS:
+        return numpy.int8
+    return object
+
+
+def _arrow_type(header):
+    if header in FLOAT_COLUMNS:
+        return pyarrow.float64()
+    if header in INT_COLUMNS:
+        return pyarrow.int64()
+    if header in FLAG_COLUMNS:
+        return pyarrow.int8()
+    return pyarrow.string()
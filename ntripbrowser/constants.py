@@ -38,11 +38,78 @@ STR_HEADERS = (
     "Distance",
 )
 
+NTRIP_TABLE_HEADERS = {"str": STR_HEADERS, "cas": CAS_HEADERS, "net": NET_HEADERS}
+
 PYCURL_COULD_NOT_RESOLVE_HOST_ERRNO = 6
 PYCURL_CONNECTION_FAILED_ERRNO = 7
 PYCURL_TIMEOUT_ERRNO = 28
 PYCURL_HANDSHAKE_ERRNO = 35
+PYCURL_WRITE_ERRNO = 23
 CURLOPT_HTTP09_ALLOWED = 285
+HTTP_NOT_MODIFIED = 304
 
 MULTICURL_SELECT_TIMEOUT = 0.5
+MULTICURL_MAX_CONNECTIONS = 64
+# seconds between checks of parses running in an executor while transfers go on
+PARSE_POLL_INTERVAL = 0.01
+# smaller responses are parsed in place, handing them to an executor costs more
+PARSE_EXECUTOR_MIN_SIZE = 256 * 1024
+# sourcetables are split into lines this many characters at a time
+PARSE_CHUNK_SIZE = 64 * 1024
+
+# responses are aborted above this size, sourcetables of the largest casters take a few MiB
+RESPONSE_MAX_SIZE = 64 * 1024 * 1024
+# responses with none of the markers within this many first bytes are no sourcetables
+SOURCETABLE_SNIFF_SIZE = 16 * 1024
+SOURCETABLE_MARKERS = (b"SOURCETABLE 200 OK", b"STR;", b"CAS;", b"NET;", b"ENDSOURCETABLE")
+RESPONSE_ABORT_TOO_LARGE = "too_large"
+RESPONSE_ABORT_NOT_SOURCETABLE = "not_sourcetable"
+
+CURL_POOL_MAX_SIZE = 16
+CURL_POOL_IDLE_TIMEOUT = 120
+# name lookups faster than this (seconds) are estimated to be answered from the shared DNS cache
+SHARE_DNS_HIT_TIME = 0.001
+SCHEDULER_HISTORY_SIZE = 32
+SCHEDULER_MIN_SAMPLES = 3
+SCHEDULER_PERCENTILE = 95
+SCHEDULER_TIMEOUT_FACTOR = 2
+SCHEDULER_MIN_TIMEOUT = 1
+SCHEDULER_MAX_TIMEOUT = 30
+SCHEDULER_FAILURE_THRESHOLD = 3
+SCHEDULER_BACKOFF = 30
+SCHEDULER_MAX_BACKOFF = 60 * 60
+ASYNC_USER_AGENT = "NTRIP ntripbrowser"
+ASYNC_READ_SIZE = 64 * 1024
+ENDPOINT_CACHE_TTL = 24 * 60 * 60
+RESPONSE_CACHE_MAX_AGE = 60
+RESPONSE_CACHE_MAX_SIZE = 64 * 1024 * 1024
+RESPONSE_CACHE_MAX_RESULTS = 32
+PARSE_MEMO_MAX_SIZE = 128
 NULL_ISLAND_COORDS = [0, 0]
+WGS84_MAJOR_AXIS_KM = 6378.137
+WGS84_FLATTENING = 1 / 298.257223563
+WGS84_MIN_CURVATURE_RADIUS_KM = 6335.439
+WGS84_MAX_CURVATURE_RADIUS_KM = 6399.594
+BOUNDING_BOX_MARGIN = 1.01
+# closer to the antipode the error of Lambert's formula exceeds 1e-4, geodesic distances are computed there
+LAMBERT_ANTIPODAL_MARGIN_DEGREES = 5
+DISTANCE_MODE_GEODESIC = "geodesic"
+DISTANCE_MODE_FAST = "fast"
+
+ROW_FORMAT_DICT = "dict"
+ROW_FORMAT_RECORD = "record"
+ROW_FORMAT_NUMPY = "numpy"
+ROW_FORMAT_ARROW = "arrow"
+
+ENDSOURCETABLE = b"ENDSOURCETABLE"
+
+ENCODING_DETECTION_SAMPLE_SIZE = 64 * 1024
+
+TABLE_CHUNK_SIZE = 1000
+
+# fields identifying a row between polls in watch mode
+WATCH_KEY_FIELDS = {"str": ("Mountpoint",), "cas": ("Host", "Port"), "net": ("ID",)}
+WATCH_JITTER = 0.1
+WATCH_EVENT_ADDED = "added"
+WATCH_EVENT_REMOVED = "removed"
+WATCH_EVENT_MODIFIED = "modified"
@@ -0,0 +1,176 @@
+"""Batched distance computation for sourcetable rows.
+
+Distances are computed with Lambert's formula for long lines on the
+WGS-84 ellipsoid. Its relative error against the exact geodesic
+distance (`geopy.distance.geodesic`) stays below 1e-4, that is
+less than 10 meters per 100 km, except near the antipode, where it
+grows to about 2e-3. Points within `LAMBERT_ANTIPODAL_MARGIN_DEGREES`
+of the antipode get their geodesic distance instead. When NumPy is
+installed all of the rows are computed in one vectorized pass.
+
+Bounding boxes are used to reject far points before computing any
+distance. They are built on a sphere with the smallest radius of
+curvature of the ellipsoid, so they never reject a point closer than
+the requested distance.
+"""
+
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from .constants import (
+    BOUNDING_BOX_MARGIN,
+    LAMBERT_ANTIPODAL_MARGIN_DEGREES,
+    NULL_ISLAND_COORDS,
+    WGS84_FLATTENING,
+    WGS84_MAJOR_AXIS_KM,
+    WGS84_MIN_CURVATURE_RADIUS_KM,
+)
+
+ANTIPODAL_SIGMA = math.pi - math.radians(LAMBERT_ANTIPODAL_MARGIN_DEGREES)
+
+
+def to_float(value):
+    try:
+        if isinstance(value, str):
+            value = value.replace(",", ".")
+        return float(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_coordinate(row):
+    """Return `(latitude, longitude)` of `row`, NaN for a row without valid coordinates."""
+    latitude, longitude = to_float(row.get("Latitude")), to_float(row.get("Longitude"))
+    if latitude is None or longitude is None or [latitude, longitude] == NULL_ISLAND_COORDS or abs(latitude) > 90:
+        return math.nan, math.nan
+    return latitude, longitude
+
+
+def parse_coordinates(rows):
+    """Return `(latitudes, longitudes)` of `rows`, NaN for rows without valid coordinates."""
+    latitudes, longitudes = [], []
+    for row in rows:
+        latitude, longitude = parse_coordinate(row)
+        latitudes.append(latitude)
+        longitudes.append(longitude)
+    return latitudes, longitudes
+
+
+def fast_distance(latitude, longitude, point):
+    """Return the distance in km from `point` to the given point, NaN for NaN coordinates."""
+    return _lambert_distance(latitude, longitude, *point)
+
+
+def fast_distances(latitudes, longitudes, point):
+    """Return distances in km from `point` to every of the given points, NaN for NaN coordinates."""
+    if numpy is None:
+        return [_lambert_distance(latitude, longitude, *point) for latitude, longitude in zip(latitudes, longitudes)]
+    return _lambert_distances(numpy.asarray(latitudes), numpy.asarray(longitudes), *point)
+
+
+def inlying_indices(distances, maxdist):
+    """Return indices of distances below `maxdist`, sorted by distance."""
+    if numpy is None:
+        indices = [index for index, distance in enumerate(distances) if distance < maxdist]
+        return sorted(indices, key=distances.__getitem__)
+    distances = numpy.asarray(distances)
+    indices = numpy.flatnonzero(distances < maxdist)
+    return indices[numpy.argsort(distances[indices], kind="stable")].tolist()
+
+
+def bounding_box(point, maxdist):
+    """Return `(south, north, half_width)` box in degrees around `point`,
+    which contains every point closer than `maxdist` km.
+
+    `half_width` is the allowed longitude difference, None when the box
+    contains a pole and so all of the longitudes.
+    """
+    latitude, _ = point
+    radius = maxdist / WGS84_MIN_CURVATURE_RADIUS_KM * BOUNDING_BOX_MARGIN
+    if radius >= math.pi / 2:
+        return -90, 90, None
+    south, north = latitude - math.degrees(radius), latitude + math.degrees(radius)
+    if south <= -90 or north >= 90:
+        return max(south, -90), min(north, 90), None
+    half_width = math.degrees(math.asin(math.sin(radius) / math.cos(math.radians(latitude))))
+    return south, north, half_width
+
+
+def inside_bounding_box(latitudes, longitudes, point, box):
+    """Return flags telling which of the given points are inside the `bounding_box` of `point`."""
+    south, north, half_width = box
+    if numpy is None:
+        return [
+            _inside_bounding_box(latitude, longitude, point[1], south, north, half_width)
+            for latitude, longitude in zip(latitudes, longitudes)
+        ]
+    latitudes, longitudes = numpy.asarray(latitudes), numpy.asarray(longitudes)
+    inside = (latitudes >= south) & (latitudes <= north)
+    if half_width is not None:
+        # longitude difference is wrapped to [-180, 180) to handle the antimeridian
+        inside &= numpy.abs((longitudes - point[1] + 180) % 360 - 180) <= half_width
+    return inside.tolist()
+
+
+def point_inside_bounding_box(latitude, longitude, point, box):
+    """Return True when the given point is inside the `bounding_box` of `point`."""
+    return _inside_bounding_box(latitude, longitude, point[1], *box)
+
+
+def _inside_bounding_box(latitude, longitude, center_longitude, south, north, half_width):
+    if not south <= latitude <= north:
+        return False
+    return half_width is None or abs((longitude - center_longitude + 180) % 360 - 180) <= half_width
+
+
+def _reduced_latitude(latitude):
+    latitude = math.radians(latitude)
+    return math.atan2((1 - WGS84_FLATTENING) * math.sin(latitude), math.cos(latitude))
+
+
+def _geodesic_distance(first_latitude, first_longitude, latitude, longitude):
+    from geopy.distance import geodesic
+
+    return geodesic((first_latitude, first_longitude), (latitude, longitude)).kilometers
+
+
+def _lambert_distances(latitudes, longitudes, latitude, longitude):
+    radians = numpy.radians(latitudes)
+    first = numpy.arctan2((1 - WGS84_FLATTENING) * numpy.sin(radians), numpy.cos(radians))
+    second = _reduced_latitude(latitude)
+    lambda_half = numpy.radians(longitudes - longitude) / 2
+    haversine = (
+        numpy.sin((second - first) / 2) ** 2 + numpy.cos(first) * numpy.cos(second) * numpy.sin(lambda_half) ** 2
+    )
+    sigma = 2 * numpy.arcsin(numpy.sqrt(numpy.clip(haversine, 0, 1)))
+    p, q = (first + second) / 2, (second - first) / 2
+    with numpy.errstate(divide="ignore", invalid="ignore"):
+        x = (sigma - numpy.sin(sigma)) * numpy.sin(p) ** 2 * numpy.cos(q) ** 2 / numpy.cos(sigma / 2) ** 2
+        y = (sigma + numpy.sin(sigma)) * numpy.cos(p) ** 2 * numpy.sin(q) ** 2 / numpy.sin(sigma / 2) ** 2
+        distances = WGS84_MAJOR_AXIS_KM * (sigma - WGS84_FLATTENING / 2 * (x + y))
+    distances = numpy.where(sigma == 0, 0.0, distances)
+    for index in numpy.flatnonzero(sigma > ANTIPODAL_SIGMA):
+        distances[index] = _geodesic_distance(latitudes[index], longitudes[index], latitude, longitude)
+    return distances
+
+
+def _lambert_distance(first_latitude, first_longitude, latitude, longitude):
+    if math.isnan(first_latitude):
+        return math.nan
+    first = _reduced_latitude(first_latitude)
+    second = _reduced_latitude(latitude)
+    lambda_half = math.radians(first_longitude - longitude) / 2
+    haversine = math.sin((second - first) / 2) ** 2 + math.cos(first) * math.cos(second) * math.sin(lambda_half) ** 2
+    sigma = 2 * math.asin(math.sqrt(min(max(haversine, 0), 1)))
+    if sigma == 0:
+        return 0.0
+    if sigma > ANTIPODAL_SIGMA:
+        return _geodesic_distance(first_latitude, first_longitude, latitude, longitude)
+    p, q = (first + second) / 2, (second - first) / 2
+    x = (sigma - math.sin(sigma)) * math.sin(p) ** 2 * math.cos(q) ** 2 / math.cos(sigma / 2) ** 2
+    y = (sigma + math.sin(sigma)) * math.cos(p) ** 2 * math.sin(q) ** 2 / math.sin(sigma / 2) ** 2
+    return WGS84_MAJOR_AXIS_KM * (sigma - WGS84_FLATTENING / 2 * (x + y))
@@ -0,0 +1,89 @@
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+from .constants import ENDPOINT_CACHE_TTL
+
+logger = logging.getLogger(__name__)
+
+
+class EndpointCache:
+    """Remember which sourcetable URL variant answered for every caster.
+
+    Parameters
+    ----------
+    ttl : float
+        Seconds after which a remembered URL is forgotten.
+    path : str or None
+        JSON file to keep the remembered URLs in between runs.
+        Without it URLs are kept in memory only.
+    """
+
+    def __init__(self, ttl=ENDPOINT_CACHE_TTL, path=None):
+        self.ttl = ttl
+        self.path = path
+        self._lock = threading.Lock()
+        self._endpoints = self._load()
+
+    @staticmethod
+    def _key(host, port):
+        return f"{host}:{port}"
+
+    def get(self, host, port):
+        key = self._key(host, port)
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                return None
+            url, stored_at = endpoint
+            if time.time() - stored_at > self.ttl:
+                del self._endpoints[key]
+                return None
+            return url
+
+    def set(self, host, port, url):
+        key = self._key(host, port)
+        now = time.time()
+        with self._lock:
+            stored_url, stored_at = self._endpoints.get(key, (None, 0))
+            # keep the file untouched while the same URL keeps winning
+            if stored_url == url and now - stored_at < self.ttl / 2:
+                return
+            self._endpoints[key] = (url, now)
+            self._save()
+
+    def forget(self, host, port):
+        with self._lock:
+            if self._endpoints.pop(self._key(host, port), None) is not None:
+                self._save()
+
+    def clear(self):
+        with self._lock:
+            self._endpoints = {}
+            self._save()
+
+    def _load(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path) as endpoints_file:
+                endpoints = json.load(endpoints_file)
+        except (OSError, ValueError):
+            logger.warning("EndpointCache: Unable to read endpoints from %s", self.path)
+            return {}
+        now = time.time()
+        return {key: (url, stored_at) for key, (url, stored_at) in endpoints.items() if now - stored_at <= self.ttl}
+
+    def _save(self):
+        if not self.path:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            with tempfile.NamedTemporaryFile("w", dir=directory, delete=False) as endpoints_file:
+                json.dump(self._endpoints, endpoints_file)
+            os.replace(endpoints_file.name, self.path)
+        except OSError:
+            logger.warning("EndpointCache: Unable to write endpoints to %s", self.path)
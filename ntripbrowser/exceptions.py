@@ -12,3 +12,11 @@ class ExceededTimeoutError(NtripbrowserError):
 
 class NoDataReceivedFromCaster(NtripbrowserError):
     pass
+
+
+class CircuitOpenError(NtripbrowserError):
+    pass
+
+
+class ResponseTooLargeError(NtripbrowserError):
+    pass
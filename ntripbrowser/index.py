@@ -0,0 +1,144 @@
+import heapq
+import math
+
+from geopy.distance import geodesic
+
+from . import distance
+from .constants import (
+    BOUNDING_BOX_MARGIN,
+    DISTANCE_MODE_FAST,
+    DISTANCE_MODE_GEODESIC,
+    WGS84_MAX_CURVATURE_RADIUS_KM,
+    WGS84_MIN_CURVATURE_RADIUS_KM,
+)
+
+
+class MountpointIndex:
+    """Spatial index over sourcetable rows for nearest and radius queries.
+
+    Rows are kept in a k-d tree of unit vectors on the sphere, so queries
+    visit only the neighbourhood of the query point. Candidates found with
+    the sphere are checked with the exact distance, which is filled into
+    the `Distance` column of the returned rows.
+
+    Parameters
+    ----------
+    rows : [dict, ...]
+        Rows of one of the `get_mountpoints` tables, for example `result["str"]`.
+        Rows without valid coordinates are not indexed.
+    distance_mode : str
+        `"geodesic"` or `"fast"`, see `NtripBrowser`.
+    """
+
+    def __init__(self, rows, distance_mode=DISTANCE_MODE_GEODESIC):
+        self.distance_mode = distance_mode
+        points = []
+        for row, latitude, longitude in zip(rows, *distance.parse_coordinates(rows)):
+            if not math.isnan(latitude):
+                points.append((self._unit_vector(latitude, longitude), (latitude, longitude), row))
+        self._size = len(points)
+        self._root = self._build(points, 0)
+
+    def __len__(self):
+        return self._size
+
+    def nearest(self, latitude, longitude, k=1):
+        """Return up to `k` rows nearest to the point, sorted by distance."""
+        if not self._root or k <= 0:
+            return []
+        target = self._unit_vector(latitude, longitude)
+        found = []
+        self._search_nearest(self._root, target, k, found)
+        farthest_chord = math.sqrt(-found[0])
+        # ranks on the sphere and on the ellipsoid may differ, so all of the rows
+        # which may be closer than the k-th one on the ellipsoid are checked
+        angle = 2 * math.asin(min(farthest_chord / 2, 1))
+        angle *= WGS84_MAX_CURVATURE_RADIUS_KM / WGS84_MIN_CURVATURE_RADIUS_KM * BOUNDING_BOX_MARGIN
+        candidates = self._candidates(target, angle)
+        return self._located(candidates, (latitude, longitude))[:k]
+
+    def within(self, latitude, longitude, km):
+        """Return rows closer than `km` to the point, sorted by distance."""
+        if not self._root:
+            return []
+        target = self._unit_vector(latitude, longitude)
+        candidates = self._candidates(target, km / WGS84_MIN_CURVATURE_RADIUS_KM * BOUNDING_BOX_MARGIN)
+        return [row for row in self._located(candidates, (latitude, longitude)) if row["Distance"] < km]
+
+    def _candidates(self, target, angle):
+        if angle >= math.pi:
+            radius = 2
+        else:
+            radius = 2 * math.sin(angle / 2)
+        candidates = []
+        self._search_within(self._root, target, radius * radius, candidates)
+        return candidates
+
+    def _located(self, candidates, point):
+        if self.distance_mode == DISTANCE_MODE_FAST:
+            latitudes = [coordinates[0] for coordinates, _ in candidates]
+            longitudes = [coordinates[1] for coordinates, _ in candidates]
+            distances = [float(value) for value in distance.fast_distances(latitudes, longitudes, point)]
+        else:
+            distances = [geodesic(coordinates, point).kilometers for coordinates, _ in candidates]
+        rows = []
+        for (_, row), row_distance in sorted(zip(candidates, distances), key=lambda candidate: candidate[1]):
+            row = dict(row)
+            row["Distance"] = row_distance
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def _unit_vector(latitude, longitude):
+        latitude, longitude = math.radians(latitude), math.radians(longitude)
+        return (
+            math.cos(latitude) * math.cos(longitude),
+            math.cos(latitude) * math.sin(longitude),
+            math.sin(latitude),
+        )
+
+    @classmethod
+    def _build(cls, points, axis):
+        if not points:
+            return None
+        points.sort(key=lambda point: point[0][axis])
+        median = len(points) // 2
+        vector, coordinates, row = points[median]
+        next_axis = (axis + 1) % 3
+        return (
+            vector,
+            coordinates,
+            row,
+            axis,
+            cls._build(points[:median], next_axis),
+            cls._build(points[median + 1 :], next_axis),
+        )
+
+    @staticmethod
+    def _squared_chord(first, second):
+        return (first[0] - second[0]) ** 2 + (first[1] - second[1]) ** 2 + (first[2] - second[2]) ** 2
+
+    def _search_nearest(self, node, target, k, found):
+        vector, _, _, axis, left, right = node
+        squared_chord = self._squared_chord(vector, target)
+        # `found` is a max-heap of negated squared chords to the k nearest rows
+        if len(found) < k:
+            heapq.heappush(found, -squared_chord)
+        elif squared_chord < -found[0]:
+            heapq.heapreplace(found, -squared_chord)
+        offset = target[axis] - vector[axis]
+        near, far = (left, right) if offset < 0 else (right, left)
+        if near:
+            self._search_nearest(near, target, k, found)
+        if far and (len(found) < k or offset * offset < -found[0]):
+            self._search_nearest(far, target, k, found)
+
+    def _search_within(self, node, target, squared_radius, candidates):
+        vector, coordinates, row, axis, left, right = node
+        if self._squared_chord(vector, target) <= squared_radius:
+            candidates.append((coordinates, row))
+        offset = target[axis] - vector[axis]
+        if left and (offset < 0 or offset * offset <= squared_radius):
+            self._search_within(left, target, squared_radius, candidates)
+        if right and (offset >= 0 or offset * offset <= squared_radius):
+            self._search_within(right, target, squared_radius, candidates)
@@ -0,0 +1,61 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+from .constants import PARSE_MEMO_MAX_SIZE
+
+
+class ParseMemo:
+    """Memoize parsed sourcetables by the hash of their raw content.
+
+    Two levels are kept, both bounded by `maxsize` entries with least
+    recently used ones evicted:
+
+    - parsed entries without distances, keyed by the content hash and
+      the row format, are reused when only the coordinates or maxdist have changed;
+    - final results, keyed by the content hash and the location and row
+      format settings, are returned as is.
+
+    Memoized results are shared between calls and must not be modified.
+    """
+
+    def __init__(self, maxsize=PARSE_MEMO_MAX_SIZE):
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._results = OrderedDict()
+
+    @staticmethod
+    def digest(raw_data):
+        return hashlib.blake2b(raw_data, digest_size=16).digest()
+
+    def get_entries(self, digest):
+        return self._get(self._entries, digest)
+
+    def set_entries(self, digest, ntrip_dictionary):
+        self._set(self._entries, digest, ntrip_dictionary)
+
+    def get_result(self, key):
+        return self._get(self._results, key)
+
+    def set_result(self, key, result):
+        self._set(self._results, key, result)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._results.clear()
+
+    def _get(self, storage, key):
+        with self._lock:
+            value = storage.get(key)
+            if value is not None:
+                storage.move_to_end(key)
+            return value
+
+    def _set(self, storage, key, value):
+        with self._lock:
+            storage[key] = value
+            storage.move_to_end(key)
+            while len(storage) > self.maxsize:
+                storage.popitem(last=False)
@@ -29,37 +29,176 @@
 # (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
 # SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 
+import concurrent.futures
+import contextlib
+import functools
 import logging
-from io import BytesIO
+import math
+import time
+from collections import deque
 
-import cchardet
 import pycurl
-from geopy.distance import geodesic
 
-from .constants import (
+from .buffers import UNLIMITED, ResponseLimits
+from .constants import (  # noqa: F401 - the table headers are re-exported
     CAS_HEADERS,
     CURLOPT_HTTP09_ALLOWED,
+    DISTANCE_MODE_FAST,
+    DISTANCE_MODE_GEODESIC,
+    ENCODING_DETECTION_SAMPLE_SIZE,
+    HTTP_NOT_MODIFIED,
+    MULTICURL_MAX_CONNECTIONS,
     MULTICURL_SELECT_TIMEOUT,
     NET_HEADERS,
+    NTRIP_TABLE_HEADERS,
     NULL_ISLAND_COORDS,
+    PARSE_CHUNK_SIZE,
+    PARSE_EXECUTOR_MIN_SIZE,
+    PARSE_POLL_INTERVAL,
     PYCURL_TIMEOUT_ERRNO,
+    PYCURL_WRITE_ERRNO,
+    RESPONSE_ABORT_NOT_SOURCETABLE,
+    RESPONSE_ABORT_TOO_LARGE,
+    ROW_FORMAT_ARROW,
+    ROW_FORMAT_DICT,
+    ROW_FORMAT_NUMPY,
     STR_HEADERS,
+    WATCH_JITTER,
 )
-from .exceptions import ExceededTimeoutError, NoDataReceivedFromCaster, UnableToConnect
+from .exceptions import (
+    CircuitOpenError,
+    ExceededTimeoutError,
+    NoDataReceivedFromCaster,
+    NtripbrowserError,
+    ResponseTooLargeError,
+    UnableToConnect,
+)
+from .records import RECORD_TYPES
+from .stats import FetchStats, timed
+from .streaming import SourcetableParser
+from .watch import diff_snapshots, poll_times, take_snapshot
 
+# geopy, cchardet and the modules importing NumPy are imported on first use,
+# so that the CLI starts up without them
 logger = logging.getLogger(__name__)
 
 
+def _split_lines(text, chunk_size=PARSE_CHUNK_SIZE):
+    """Yield the lines of `text` as `str.splitlines` does, one chunk of the text at a time.
+
+    Chunks end after a line feed, so that no line break is cut in two,
+    and only the lines of one chunk are held at once.
+    """
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start + chunk_size) + 1 or len(text)
+        yield from text[start:end].splitlines()
+        start = end
+
+
+@functools.cache
+def _dict_row_builder(fields):
+    """Return a function forming the dictionary row of `fields` from the values of a split line.
+
+    A dictionary display with constant keys is built at its final size,
+    which is faster than growing the dictionary with `dict(zip())`.
+    Values in excess of `fields` are ignored, rows of lines with fewer
+    values than `fields` have the leading fields only.
+    """
+    items = ", ".join(f"{field!r}: values[{index}]" for index, field in enumerate(fields))
+    source = (
+        "def build_row(values):\n"
+        "    try:\n"
+        f"        return {{{items}}}\n"
+        "    except IndexError:\n"
+        "        return dict(zip(fields, values))\n"
+    )
+    namespace = {"fields": fields}
+    exec(source, namespace)  # noqa: S102 - the source is formed from the constant headers
+    return namespace["build_row"]
+
+
+def fetch_failure_error(urls, urls_processed, failures):
+    """Return the error of a fetch which has received no valid result.
+
+    - If the number of processed URL's is equal to the number of URL's
+    which are requested to poll, this means that no data received from casters.
+    - If in `failures` timeout error exist, use it as a fail reason.
+    - If a transfer is aborted for exceeding the response size limit,
+    return ResponseTooLargeError.
+    - If no failures with exceeded timeout are found, return UnableToConnect
+    with first failure reason.
+    - Otherwise, there are no failures and all transfers which are succeeded
+    received no data from the caster, so return a NoDataReceivedFromCaster.
+
+    Parameters
+    ----------
+    urls : [str, str, ...]
+        URL's requested.
+    urls_processed : [str, str, ...]
+        URL's on which no valid data was found.
+    failures : [(key, int, str), ...]
+        Failed transfers with their curl error codes and texts.
+    """
+    if len(urls_processed) == len(urls):
+        return NoDataReceivedFromCaster()
+    for _, error_code, error_text in failures:
+        if error_code == PYCURL_TIMEOUT_ERRNO:
+            return ExceededTimeoutError(error_text)
+    for _, error_code, error_text in failures:
+        if error_code == PYCURL_WRITE_ERRNO:
+            return ResponseTooLargeError(error_text)
+    if failures:
+        _, _, error_text = failures[0]
+        return UnableToConnect(error_text)
+    return NoDataReceivedFromCaster()
+
+
 class DataFetcher:
     """Fetch data from specified urls, execute custom callback on results.
 
+    The first url whose response is accepted by `parser_method` wins,
+    transfers still running at that moment are aborted.
+
     Parameters
     ----------
     urls : [str, str, ...]
-        URL's to fetch data from.
-    timeout : int
+        URL's to fetch data from, in the order of preference.
+    timeout : float
+        Seconds a transfer may take.
     parser_method : callable
         Custom callback to be executed on fetched from url's results.
+    stagger_delay : float or None
+        Delay in seconds before starting a request to the next url while
+        the previous ones have not answered yet ("happy eyeballs").
+        The next url is also started immediately when all running requests
+        are finished without a result. By default all urls are requested at once.
+    cache : ResponseCache or None
+        Cache of responses, fresh responses are parsed without any request,
+        stale ones are revalidated with conditional requests.
+    pool : CurlPool or None
+        Pool to take curls from and return them to, so that connections,
+        DNS and TLS sessions are reused. By default curls are created for
+        every fetch and closed after it.
+    share : CurlShareCache or None
+        Share to attach the created curls to, so that DNS entries, TLS
+        sessions and connections are reused across fetchers. With `pool`
+        the share of the pool is used instead.
+    connect_timeout : float or None
+        Seconds connecting may take, `timeout` by default.
+    stats : FetchStats or None
+        Stats to record the winning url and its transfer timings into.
+    parse_submitter : callable or None
+        Called with a response body, returns a `concurrent.futures.Future`
+        of the `parser_method` result to parse the response elsewhere, or None
+        to parse it right away. Only `MultiCasterFetcher` waits for such futures.
+    response_limits : ResponseLimits or None
+        Limits of the response buffers, transfers breaking them are aborted.
+        Responses spilled to a file are passed to `parser_method` as a memory map.
+        By default responses are buffered in memory without any limit.
+    result_key : hashable or None
+        Settings `parser_method` depends on. With `cache` results are kept
+        under it, fresh and not modified responses are not parsed again then.
 
     Attributes
     ----------
@@ -68,17 +207,56 @@ class DataFetcher:
 
     result :
         Return value of `parser_method` function or None.
+
+    winning_url : str or None
+        URL the result is received from.
+
+    latency : (float or None, float) or None
+        Connect and total time in seconds of the winning transfer, connect
+        time is None when an open connection was reused.
     """
 
-    def __init__(self, urls, timeout, parser_method):
+    def __init__(
+        self,
+        urls,
+        timeout,
+        parser_method,
+        stagger_delay=None,
+        cache=None,
+        pool=None,
+        share=None,
+        connect_timeout=None,
+        stats=None,
+        parse_submitter=None,
+        response_limits=None,
+        result_key=None,
+    ):
         self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.stats = stats
+        self.parse_submitter = parse_submitter
+        self.response_limits = response_limits
+        self.result_key = result_key
         self.urls = urls
+        self.stagger_delay = stagger_delay
+        self.cache = cache
+        self.pool = pool
+        self.share = share
         self._parser_method = parser_method
         self.urls_processed = []
         self.results = None
+        self.winning_url = None
+        self.latency = None
         self._multicurl = None
         self._buffers = {}
+        self._curl_urls = {}
+        self._headers = {}
+        self._cached_responses = {}
         self._curls_failed = []
+        self._curls_pending = []
+        self._curls_running = set()
+        self._parses_pending = {}
+        self._next_start_time = 0
 
     @property
     def curls(self):
@@ -88,25 +266,76 @@ class DataFetcher:
     def _result_found(self):
         return bool(self.results)
 
+    @property
+    def _all_curls_done(self):
+        finished = len(self.urls_processed) + len(self._curls_failed) >= len(self.urls)
+        return finished and not self._parses_pending
+
     def setup(self):
+        self._multicurl = pycurl.CurlMulti()
+        self._prepare()
+        logger.info("DataFetcher: curls setup in process")
+        self._curls_pending = self.curls
+        self._curls_running = set()
+        self._start_due_curls()
+
+    def _prepare(self):
         self.urls_processed = []
         self.results = None
-        self._multicurl = pycurl.CurlMulti()
-        self._buffers = {}
+        self.winning_url = None
+        self.latency = None
+        self._close_buffers()
+        self._curl_urls = {}
+        self._headers = {}
+        self._cached_responses = {}
         self._curls_failed = []
-        self._initialize()
-        logger.info("DataFetcher: curls setup in process")
-        for curl in self.curls:
-            self._multicurl.add_handle(curl)
+        self._parses_pending = {}
+        self._process_fresh_responses()
+        if not self._result_found:
+            self._initialize()
+
+    def _process_fresh_responses(self):
+        if self.cache is None:
+            return
+        for url in self.urls:
+            response = self.cache.get_fresh(url)
+            if response is None:
+                continue
+            logger.info('DataFetcher: Trying to parse cached response from "%s"', url)
+            try:
+                self.results = self._parse_cached(response)
+            except NoDataReceivedFromCaster:
+                self.cache.invalidate(url)
+                continue
+            self.winning_url = url
+            if self.stats is not None:
+                self.stats.url = url
+            return
+
+    def _parse_cached(self, response):
+        results = self._cached_result(response)
+        if results is None:
+            results = self._parser_method(response.body)
+            self._remember_result(response, results)
+        return results
+
+    def _cached_result(self, response):
+        if self.result_key is None:
+            return None
+        return self.cache.get_result(response, self.result_key)
+
+    def _remember_result(self, response, results):
+        if self.result_key is not None:
+            self.cache.set_result(response, self.result_key, results)
 
     def _initialize(self):
         for url in self.urls:
             logger.debug('DataFetcher: Buffered curl creation for url "%s" in process', url)
-            buffer = BytesIO()
-            curl = pycurl.Curl()
+            buffer = (self.response_limits or UNLIMITED).buffer()
+            curl = self._new_curl()
             curl.setopt(pycurl.URL, url)
-            curl.setopt(pycurl.TIMEOUT, self.timeout)
-            curl.setopt(pycurl.CONNECTTIMEOUT, self.timeout)
+            curl.setopt(pycurl.TIMEOUT_MS, int(self.timeout * 1000))
+            curl.setopt(pycurl.CONNECTTIMEOUT_MS, int((self.connect_timeout or self.timeout) * 1000))
             curl.setopt(pycurl.WRITEFUNCTION, buffer.write)
             curl.setopt(pycurl.WRITEDATA, buffer)
             # starting from libcurl 7.66.0 HTTP/0.9 responses are not allowed by default
@@ -114,75 +343,504 @@ class DataFetcher:
             # can emit response that curl might consider to be HTTP/0.9
             # https://curl.se/libcurl/c/CURLOPT_HTTP09_ALLOWED.html
             curl.setopt(CURLOPT_HTTP09_ALLOWED, 1)
+            if self.cache is not None:
+                self._setup_revalidation(curl, url)
             self._buffers.update({curl: buffer})
+            self._curl_urls.update({curl: url})
+
+    def _new_curl(self):
+        if self.pool is not None:
+            return self.pool.acquire()
+        curl = pycurl.Curl()
+        if self.share is not None:
+            self.share.attach(curl)
+        return curl
+
+    def _close_buffers(self):
+        for buffer in self._buffers.values():
+            buffer.close()
+        self._buffers = {}
+
+    def _record_transfer(self, curl):
+        share = self.pool.share if self.pool is not None else self.share
+        if share is not None:
+            share.record(curl)
+
+    def _close_curl(self, curl):
+        if self.pool is not None:
+            self.pool.release(curl)
+        else:
+            curl.close()
+
+    def _setup_revalidation(self, curl, url):
+        headers = []
+        curl.setopt(pycurl.HEADERFUNCTION, headers.append)
+        self._headers.update({curl: headers})
+        response = self.cache.get(url)
+        if response is not None:
+            curl.setopt(pycurl.HTTPHEADER, self.cache.conditional_headers(response))
+            self._cached_responses.update({curl: response})
+
+    def _start_due_curls(self):
+        now = time.monotonic()
+        while self._curls_pending and (not self._curls_running or now >= self._next_start_time):
+            curl = self._curls_pending.pop(0)
+            logger.debug('DataFetcher: Starting curl for url "%s"', self._curl_urls[curl])
+            self._multicurl.add_handle(curl)
+            self._curls_running.add(curl)
+            self._next_start_time = now + (self.stagger_delay or 0)
+
+    def _select_timeout(self):
+        if self._curls_pending:
+            return max(0, min(MULTICURL_SELECT_TIMEOUT, self._next_start_time - time.monotonic()))
+        return MULTICURL_SELECT_TIMEOUT
 
     def read_data(self):
-        while not self._result_found:
-            ret, num_handles = self._multicurl.perform()
+        while True:
+            self._start_due_curls()
+            self._perform()
+            self._read_multicurl_info()
+            if self._result_found:
+                self._abort_running_curls()
+                return
+            if not self._curls_running and not self._curls_pending:
+                break
+            self._multicurl.select(self._select_timeout())
+        self._process_fetch_failure()
+
+    def _perform(self):
+        while True:
+            ret, _ = self._multicurl.perform()
             if ret != pycurl.E_CALL_MULTI_PERFORM:
                 break
 
-        while num_handles:
-            self._multicurl.select(MULTICURL_SELECT_TIMEOUT)
-            while not self._result_found:
-                ret, num_handles = self._multicurl.perform()
-                self._read_multicurl_info()
+    def _read_multicurl_info(self):
+        num_queued = 1
+        while num_queued:
+            num_queued, successful_curls, failed_curls = self._multicurl.info_read()
+            for curl, error_code, error_text in failed_curls:
+                self._finish_curl(curl)
+                self._process_failed_curl(curl, error_code, error_text)
+            for curl in successful_curls:
+                self._finish_curl(curl)
+                self._process_successful_curl(curl)
                 if self._result_found:
                     return
-                if ret != pycurl.E_CALL_MULTI_PERFORM:
-                    break
-        self._process_fetch_failure()
 
-    def _read_multicurl_info(self):
-        _, successful_curls, failed_curls = self._multicurl.info_read()
-        for suc_curl in successful_curls:
-            print(f"success = {suc_curl.getinfo(pycurl.EFFECTIVE_URL)}")
-        self._curls_failed.extend(failed_curls)
-        for curl in successful_curls:
-            self._process_successful_curl(curl)
-            if self._result_found:
-                return
+    def _finish_curl(self, curl):
+        self._multicurl.remove_handle(curl)
+        self._curls_running.discard(curl)
+
+    def _abort_running_curls(self):
+        for curl in self._curls_running:
+            logger.debug('DataFetcher: Aborting curl for url "%s"', self._curl_urls[curl])
+            self._multicurl.remove_handle(curl)
+        self._curls_running = set()
+        self._curls_pending = []
 
     def _process_successful_curl(self, curl):
-        curl_results = self._buffers[curl].getvalue()
+        self._record_transfer(curl)
+        not_modified = self._is_not_modified(curl)
+        if not_modified:
+            curl_results = self._cached_responses[curl].body
+        else:
+            curl_results = self._buffers[curl].getvalue()
         url_processed = curl.getinfo(pycurl.EFFECTIVE_URL)
         self.urls_processed.append(url_processed)
+        results = self._cached_result(self._cached_responses[curl]) if not_modified else None
+        if results is not None:
+            logger.info('DataFetcher: Response from "%s" is not modified, using its parsed result', url_processed)
+            self._accept_response(curl, curl_results, not_modified, results)
+            return
         logger.info('DataFetcher: Trying to parse curl response from "%s"', url_processed)
+        future = self.parse_submitter(curl_results) if self.parse_submitter is not None else None
+        if future is not None:
+            self._parses_pending.update({future: (curl, curl_results, not_modified)})
+            return
+        try:
+            results = self._parser_method(curl_results)
+        except NoDataReceivedFromCaster:
+            self._reject_response(url_processed)
+        else:
+            self._accept_response(curl, curl_results, not_modified, results)
+
+    def _process_failed_curl(self, curl, error_code, error_text):
+        """Record the failure of `curl`, responses aborted as no sourcetable count as processed."""
+        url = self._curl_urls[curl]
+        abort_reason = self._buffers[curl].abort_reason
+        if abort_reason == RESPONSE_ABORT_NOT_SOURCETABLE:
+            logger.info('DataFetcher: Response from "%s" is no sourcetable, transfer is aborted', url)
+            self.urls_processed.append(url)
+            return
+        if abort_reason == RESPONSE_ABORT_TOO_LARGE:
+            logger.info('DataFetcher: Response from "%s" is too large, transfer is aborted', url)
+            error_code = PYCURL_WRITE_ERRNO
+            error_text = f"Response exceeds {self.response_limits.max_size} bytes"
+        self._curls_failed.append((curl, error_code, error_text))
+
+    def _process_finished_parse(self, future):
+        curl, curl_results, not_modified = self._parses_pending.pop(future)
+        if self._result_found:
+            return
         try:
-            self.results = self._parser_method(curl_results)
-            logger.info('DataFetcher: Results from "%s" is processed successfully', url_processed)
+            try:
+                results = future.result()
+            except concurrent.futures.BrokenExecutor:
+                logger.warning("DataFetcher: Parse executor is broken, parsing in place")
+                results = self._parser_method(curl_results)
         except NoDataReceivedFromCaster:
-            self.results = None
-            logger.info('DataFetcher: No valid data found in curl response from "%s"', url_processed)
+            self._reject_response(self._curl_urls[curl])
+        else:
+            self._accept_response(curl, curl_results, not_modified, results)
+
+    def _accept_response(self, curl, curl_results, not_modified, results):
+        self.results = results
+        self.winning_url = self._curl_urls[curl]
+        self.latency = self._latency(curl)
+        self._record_stats(curl)
+        response = self._store_response(curl, curl_results, not_modified)
+        if response is not None:
+            self._remember_result(response, results)
+        logger.info('DataFetcher: Results from "%s" is processed successfully', self.winning_url)
+
+    def _reject_response(self, url):
+        self.results = None
+        logger.info('DataFetcher: No valid data found in curl response from "%s"', url)
+
+    def _record_stats(self, curl):
+        if self.stats is not None:
+            self.stats.url = self._curl_urls[curl]
+            self.stats.record_transfer(curl)
+
+    @staticmethod
+    def _latency(curl):
+        connect_time = curl.getinfo(pycurl.CONNECT_TIME) if curl.getinfo(pycurl.NUM_CONNECTS) else None
+        return connect_time, curl.getinfo(pycurl.TOTAL_TIME)
+
+    def _is_not_modified(self, curl):
+        return curl in self._cached_responses and curl.getinfo(pycurl.RESPONSE_CODE) == HTTP_NOT_MODIFIED
+
+    def _store_response(self, curl, body, not_modified):
+        if self.cache is None:
+            return None
+        if not_modified:
+            self.cache.revalidated(self._cached_responses[curl])
+            return self._cached_responses[curl]
+        # spilled responses are memory maps, which are closed with their buffers
+        return self.cache.store(self._curl_urls[curl], bytes(body), self._response_headers(curl))
+
+    def _response_headers(self, curl):
+        headers = {}
+        for line in self._headers[curl]:
+            line = line.decode("latin-1")
+            if line.startswith("HTTP/"):
+                headers = {}
+            name, _, value = line.partition(":")
+            if value:
+                headers[name.strip().lower()] = value.strip()
+        return headers
 
     def _process_fetch_failure(self):
-        """- If the number of processed URL's is equal to the number of URL's
-        which are requested to poll, this means that no data received from casters.
-        - If in failed curls list timeout error exist, use it as a fail reason.
-        - If no curls with exceeded timeout are found, throw UnableToConnect
-        with first failed curl reason.
-        - Otherwise, there are no failed curls and all curls which are succeeds
-        received no data from the caster, so throw a NoDataReceivedFromCaster.
-        """
         logger.info("DataFetcher: No valid result is received")
-        if len(self.urls_processed) == len(self.urls):
-            raise NoDataReceivedFromCaster()
-        for _, error_code, error_text in self._curls_failed:
-            if error_code == PYCURL_TIMEOUT_ERRNO:
-                raise ExceededTimeoutError(error_text)
-        if self._curls_failed:
-            _, _, error_text = self._curls_failed[0]
-            raise UnableToConnect(error_text)
-        raise NoDataReceivedFromCaster()
+        raise fetch_failure_error(self.urls, self.urls_processed, self._curls_failed)
 
     def teardown(self):
-        for curl in self.curls:
-            self._multicurl.remove_handle(curl)
+        self._abort_running_curls()
         self._multicurl.close()
         for curl in self.curls:
-            curl.close()
+            self._close_curl(curl)
         logger.info("DataFetcher: Curls are closed succesfully")
-        self._buffers = {}
+        self._close_buffers()
+
+
+class MultiCasterFetcher:
+    """Fetch data from several casters over one shared CurlMulti.
+
+    Every caster is described by its own `DataFetcher`, which keeps the
+    per-caster state (buffers, processed and failed curls, results), while
+    this class drives all of their curls with a single multi handle.
+    Responses which fetchers hand to a parse executor are parsed while
+    the transfers of the other casters go on.
+
+    Parameters
+    ----------
+    fetchers : {key: DataFetcher, ...}
+        Fetchers to drive, `key` is reported back with the caster results.
+    max_connections : int
+        Maximum number of transfers running at the same time.
+    """
+
+    def __init__(self, fetchers, max_connections=MULTICURL_MAX_CONNECTIONS):
+        self.fetchers = fetchers
+        self.max_connections = max_connections
+        self._multicurl = None
+        self._owners = {}
+        self._queue = deque()
+        self._active = set()
+        self._parsing = {}
+
+    def fetch(self):
+        """Yield `(key, result)` pairs in the order the casters finish.
+
+        `result` is the return value of the fetcher `parser_method` or
+        the `NtripbrowserError` instance describing why the caster failed.
+        """
+        self._setup()
+        try:
+            for key, fetcher in self.fetchers.items():
+                if fetcher._result_found:
+                    yield key, fetcher.results
+            while self._queue or self._active or self._parsing:
+                self._start_queued_curls()
+                self._perform()
+                yield from self._read_multicurl_info()
+                yield from self._read_finished_parses()
+                self._wait()
+        finally:
+            self._teardown()
+
+    def _setup(self):
+        self._multicurl = pycurl.CurlMulti()
+        self._owners = {}
+        self._queue = deque()
+        self._active = set()
+        self._parsing = {}
+        for key, fetcher in self.fetchers.items():
+            fetcher._prepare()
+            for curl in fetcher.curls:
+                self._owners[curl] = (key, fetcher)
+                self._queue.append(curl)
+        logger.info("MultiCasterFetcher: %d curls queued for %d casters", len(self._queue), len(self.fetchers))
+
+    def _start_queued_curls(self):
+        while self._queue and len(self._active) < self.max_connections:
+            curl = self._queue.popleft()
+            self._multicurl.add_handle(curl)
+            self._active.add(curl)
+
+    def _perform(self):
+        while True:
+            ret, _ = self._multicurl.perform()
+            if ret != pycurl.E_CALL_MULTI_PERFORM:
+                break
+
+    def _wait(self):
+        if self._active and self._parsing:
+            self._multicurl.select(PARSE_POLL_INTERVAL)
+        elif self._active:
+            self._multicurl.select(MULTICURL_SELECT_TIMEOUT)
+        elif self._parsing:
+            concurrent.futures.wait(self._parsing, return_when=concurrent.futures.FIRST_COMPLETED)
+
+    def _read_finished_parses(self):
+        for future in [future for future in self._parsing if future.done()]:
+            # parses of the fetchers released in the meantime are dropped
+            if future not in self._parsing:
+                continue
+            key, fetcher = self._parsing.pop(future)
+            fetcher._process_finished_parse(future)
+            yield from self._report(key, fetcher)
+
+    def _read_multicurl_info(self):
+        num_queued = 1
+        while num_queued:
+            num_queued, successful_curls, failed_curls = self._multicurl.info_read()
+            for curl in successful_curls:
+                yield from self._process_finished_curl(curl, None)
+            for curl, error_code, error_text in failed_curls:
+                yield from self._process_finished_curl(curl, (curl, error_code, error_text))
+
+    def _process_finished_curl(self, curl, failure):
+        if curl not in self._owners:
+            return
+        key, fetcher = self._owners[curl]
+        self._multicurl.remove_handle(curl)
+        self._active.discard(curl)
+        if failure:
+            fetcher._process_failed_curl(*failure)
+        else:
+            fetcher._process_successful_curl(curl)
+            for future in fetcher._parses_pending:
+                self._parsing.setdefault(future, (key, fetcher))
+        yield from self._report(key, fetcher)
+
+    def _report(self, key, fetcher):
+        if fetcher._result_found:
+            self._release(fetcher)
+            yield key, fetcher.results
+        elif fetcher._all_curls_done:
+            self._release(fetcher)
+            try:
+                fetcher._process_fetch_failure()
+            except NtripbrowserError as error:
+                yield key, error
+
+    def _release(self, fetcher):
+        for future in list(fetcher._parses_pending):
+            future.cancel()
+            self._parsing.pop(future, None)
+        fetcher._parses_pending = {}
+        for curl in fetcher.curls:
+            del self._owners[curl]
+            if curl in self._active:
+                self._multicurl.remove_handle(curl)
+                self._active.discard(curl)
+            elif curl in self._queue:
+                self._queue.remove(curl)
+            fetcher._close_curl(curl)
+        fetcher._close_buffers()
+
+    def _teardown(self):
+        for fetcher in {fetcher for _, fetcher in self._owners.values()}:
+            self._release(fetcher)
+        self._multicurl.close()
+        logger.info("MultiCasterFetcher: Curls are closed succesfully")
+
+
+class StreamingFetcher(DataFetcher):
+    """Fetch sourcetable from specified urls and yield records while they arrive.
+
+    Every url response is fed into its own `SourcetableParser`, the first
+    one which yields a record wins and the other transfers are aborted.
+    The transfer is finished as soon as `ENDSOURCETABLE` is received.
+    Failure reasons are reported in the same way as `DataFetcher` does,
+    responses are checked against `response_limits` but never spilled.
+    `known_encoding` is passed on to the parsers.
+    """
+
+    def __init__(
+        self,
+        urls,
+        timeout,
+        stagger_delay=None,
+        pool=None,
+        share=None,
+        stats=None,
+        response_limits=None,
+        known_encoding=None,
+    ):
+        super().__init__(
+            urls, timeout, None, stagger_delay, pool=pool, share=share, stats=stats, response_limits=response_limits
+        )
+        self.known_encoding = known_encoding
+        self._parsers = {}
+        self._winner = None
+
+    def iter_records(self):
+        """Yield `(table, line)` pairs of the winning sourcetable."""
+        self.setup()
+        try:
+            while not self._winner_finished:
+                if self._winner is None:
+                    self._start_due_curls()
+                self._perform()
+                self._read_multicurl_info()
+                self._choose_winner()
+                if self._winner is not None:
+                    yield from self._parsers[self._winner].pop_records()
+                elif not self._curls_running and not self._curls_pending:
+                    self._process_fetch_failure()
+                if not self._winner_finished:
+                    self._multicurl.select(self._select_timeout())
+        finally:
+            if self._winner is not None:
+                self._record_stats(self._winner)
+            self.teardown()
+
+    @property
+    def encoding(self):
+        """Encoding of the winning sourcetable when it is not UTF-8, otherwise None."""
+        if self._winner is None or self._parsers[self._winner].encoding == "utf8":
+            return None
+        return self._parsers[self._winner].encoding
+
+    @property
+    def _winner_finished(self):
+        if self._winner is None:
+            return False
+        parser = self._parsers[self._winner]
+        return not parser.records and (parser.finished or self._winner not in self._curls_running)
+
+    def _prepare(self):
+        super()._prepare()
+        self._winner = None
+
+    def _initialize(self):
+        super()._initialize()
+        self._parsers = {}
+        for curl in self.curls:
+            parser = SourcetableParser(self.known_encoding)
+            buffer = (self.response_limits or UNLIMITED).buffer(consumer=parser.feed)
+            curl.setopt(pycurl.WRITEFUNCTION, buffer.write)
+            self._buffers.update({curl: buffer})
+            self._parsers.update({curl: parser})
+
+    def _read_multicurl_info(self):
+        num_queued = 1
+        while num_queued:
+            num_queued, successful_curls, failed_curls = self._multicurl.info_read()
+            for curl, error_code, error_text in failed_curls:
+                self._finish_curl(curl)
+                self._process_failed_curl(curl, error_code, error_text)
+                if curl is self._winner:
+                    logger.info('StreamingFetcher: Transfer from "%s" is interrupted', self.winning_url)
+                    self._process_fetch_failure()
+            for curl in successful_curls:
+                self._finish_curl(curl)
+                self._record_transfer(curl)
+                self._parsers[curl].close()
+                self.urls_processed.append(self._curl_urls[curl])
+
+    def _choose_winner(self):
+        if self._winner is not None:
+            return
+        for curl in self.curls:
+            if self._parsers[curl].found_records:
+                self._winner = curl
+                self.winning_url = self._curl_urls[curl]
+                logger.info('StreamingFetcher: Streaming sourcetable from "%s"', self.winning_url)
+                self._abort_losing_curls()
+                return
+
+    def _abort_losing_curls(self):
+        for curl in self._curls_running - {self._winner}:
+            logger.debug('StreamingFetcher: Aborting curl for url "%s"', self._curl_urls[curl])
+            self._multicurl.remove_handle(curl)
+        self._curls_running &= {self._winner}
+        self._curls_pending = []
+
+
+def process_sourcetable(raw_data, caster, settings, encoding=None):
+    """Process a sourcetable as an `NtripBrowser` with `settings` would, in a parse executor worker.
+
+    Returns the result, the encoding of the sourcetable when it is not
+    UTF-8 and the parse phase times.
+    """
+    browser = NtripBrowser(*caster, **settings)
+    if encoding is not None:
+        browser._caster_encodings[caster] = encoding
+    stats = FetchStats(caster)
+    result = browser._process_raw_data(raw_data, caster, stats)
+    return result, browser._caster_encodings.get(caster), stats.parse_times
+
+
+def _chain(future, function):
+    """Return a future of `function` applied to the result of `future`, cancelling it cancels `future`."""
+    chained = concurrent.futures.Future()
+
+    def resolve(done):
+        if done.cancelled() or chained.cancelled():
+            return
+        try:
+            outcome = functools.partial(chained.set_result, function(done.result()))
+        except Exception as error:  # noqa: BLE001 - passed on to the chained future
+            outcome = functools.partial(chained.set_exception, error)
+        with contextlib.suppress(concurrent.futures.InvalidStateError):
+            outcome()
+
+    chained.add_done_callback(lambda chained: chained.cancelled() and future.cancel())
+    future.add_done_callback(resolve)
+    return chained
 
 
 class NtripBrowser:
@@ -193,6 +851,19 @@ class NtripBrowser:
         timeout=4,
         coordinates=None,
         maxdist=None,
+        stagger_delay=None,
+        endpoint_cache=None,
+        response_cache=None,
+        memo=None,
+        distance_mode=DISTANCE_MODE_GEODESIC,
+        row_format=ROW_FORMAT_DICT,
+        curl_pool=None,
+        curl_share=None,
+        scheduler=None,
+        stats_hook=None,
+        parse_executor=None,
+        parse_threshold=PARSE_EXECUTOR_MIN_SIZE,
+        response_limits=None,
     ):
         self._host = None
         self.host = host
@@ -200,7 +871,24 @@ class NtripBrowser:
         self.timeout = timeout
         self.coordinates = coordinates
         self.maxdist = maxdist
-        self._fetcher = DataFetcher(self.urls, self.timeout, self._process_raw_data)
+        self.winning_url = None
+        self.endpoint_cache = endpoint_cache
+        self.response_cache = response_cache
+        self.memo = memo
+        self.distance_mode = distance_mode
+        self.row_format = row_format
+        self.curl_pool = curl_pool
+        self.curl_share = curl_share
+        self.scheduler = scheduler
+        self.stats_hook = stats_hook
+        self.stats = None
+        self.parse_executor = parse_executor
+        self.parse_threshold = parse_threshold
+        self.response_limits = ResponseLimits() if response_limits is None else response_limits
+        self._caster_encodings = {}
+        self._fetcher = DataFetcher(
+            self.urls, self.timeout, self._process_fetched, stagger_delay, response_cache, curl_pool, curl_share
+        )
 
     @property
     def host(self):
@@ -208,83 +896,507 @@ class NtripBrowser:
 
     @host.setter
     def host(self, host):
+        self._host = self._strip_scheme(host)
+
+    @staticmethod
+    def _strip_scheme(host):
         host = host.replace("http://", "")
         host = host.replace("https://", "")
-        self._host = host
+        return host
 
     @property
     def urls(self):
-        http_url = "{}{}:{}".format("http://", self.host, self.port)
-        https_url = "{}{}:{}".format("https://", self.host, self.port)
+        return self._build_urls(self.host, self.port)
+
+    @staticmethod
+    def _build_urls(host, port):
+        http_url = "{}{}:{}".format("http://", host, port)
+        https_url = "{}{}:{}".format("https://", host, port)
         http_sourcetable_url = "{}{}".format(http_url, "/sourcetable.txt")
         https_sourcetable_url = "{}{}".format(https_url, "/sourcetable.txt")
         return [http_url, http_sourcetable_url, https_url, https_sourcetable_url]
 
     def get_mountpoints(self):
-        self._fetcher.setup()
-        self._fetcher.read_data()
-        self._fetcher.teardown()
+        if self.scheduler is None:
+            return self._get_mountpoints()
+        self.scheduler.check(self.host, self.port)
+        try:
+            result = self._get_mountpoints()
+        except NtripbrowserError as error:
+            self._record_outcome(self.host, self.port, None, error)
+            raise
+        self._record_outcome(self.host, self.port, self._fetcher, result)
+        return result
+
+    def _get_mountpoints(self):
+        known_url = self._known_url(self.host, self.port)
+        if known_url:
+            try:
+                return self._fetch_mountpoints([known_url])
+            except NtripbrowserError:
+                logger.info('NtripBrowser: Known url "%s" failed, trying all of the urls', known_url)
+                self.endpoint_cache.forget(self.host, self.port)
+        return self._fetch_mountpoints(self._preferred_urls())
+
+    def watch(self, interval, jitter=WATCH_JITTER):
+        """Poll the caster every `interval` seconds and yield changes of its sourcetable.
+
+        The first poll yields every row as added, the next ones yield only
+        rows added, removed or modified since the previous successful poll,
+        see `WatchEvent`. Polls are offset by up to `jitter` of `interval`
+        at random, so that many watchers do not poll casters in lockstep.
+        A failed poll is logged and skipped, the previous sourcetable is kept.
+        Rows are compared as mappings, so `row_format` must be "dict" or "record".
+        """
+        snapshot = {}
+        for poll_time in poll_times(interval, jitter):
+            time.sleep(max(0, poll_time - time.monotonic()))
+            try:
+                current = take_snapshot(self.get_mountpoints())
+            except NtripbrowserError as error:
+                logger.warning("NtripBrowser: Polling %s:%s failed: %r", self.host, self.port, error)
+                continue
+            yield from diff_snapshots(snapshot, current)
+            snapshot = current
+
+    def _known_url(self, host, port):
+        if self.endpoint_cache is None:
+            return None
+        known_url = self.endpoint_cache.get(host, port)
+        return known_url if known_url in self._build_urls(host, port) else None
+
+    def _fetch_mountpoints(self, urls):
+        self._fetcher.urls = urls
+        self._fetcher.connect_timeout, self._fetcher.timeout = self._timeouts(self.host, self.port)
+        self._fetcher.cache = self.response_cache
+        self._fetcher.pool = self.curl_pool
+        self._fetcher.share = self.curl_share
+        self._fetcher.response_limits = self.response_limits
+        self._fetcher.result_key = self._result_key()
+        stats = self._fetcher.stats = FetchStats((self.host, self.port))
+        try:
+            self._fetcher.setup()
+            self._fetcher.read_data()
+        except NtripbrowserError as error:
+            stats.error = error
+            raise
+        finally:
+            self._fetcher.teardown()
+            self._report_stats(stats)
+        self.winning_url = self._fetcher.winning_url
+        if self.endpoint_cache is not None:
+            self.endpoint_cache.set(self.host, self.port, self.winning_url)
         return self._fetcher.results
 
-    def _process_raw_data(self, raw_data):
-        decoded_raw_ntrip = self._decode_data(raw_data)
-        ntrip_tables = self._get_ntrip_tables(decoded_raw_ntrip)
-        ntrip_dictionary = self._form_ntrip_entries(ntrip_tables)
-        ntrip_dictionary = self._add_distance(ntrip_dictionary)
-        return self._trim_outlying(ntrip_dictionary)
+    def _process_fetched(self, raw_data):
+        return self._process_raw_data(raw_data, stats=self._fetcher.stats)
 
-    @staticmethod
-    def _decode_data(data):
-        data_encoding = cchardet.detect(data)["encoding"]
-        return data.decode("utf8" if not data_encoding else data_encoding)
+    def _report_stats(self, stats):
+        self.stats = stats
+        if self.stats_hook is None:
+            return
+        try:
+            self.stats_hook(stats)
+        except Exception:
+            logger.exception("NtripBrowser: Stats hook failed")
+
+    def _timeouts(self, host, port):
+        if self.scheduler is None:
+            return None, self.timeout
+        return self.scheduler.timeouts(host, port, self.timeout)
+
+    def _record_outcome(self, host, port, fetcher, result):
+        if isinstance(result, (UnableToConnect, ExceededTimeoutError)):
+            self.scheduler.record_failure(host, port)
+        elif isinstance(result, NtripbrowserError):
+            self.scheduler.release(host, port)
+        else:
+            self.scheduler.record_success(host, port, *(fetcher.latency or ()))
+
+    def _preferred_urls(self):
+        urls = self.urls
+        if self.winning_url in urls:
+            urls.remove(self.winning_url)
+            urls.insert(0, self.winning_url)
+        return urls
+
+    def get_mountpoints_many(self, casters, max_connections=MULTICURL_MAX_CONNECTIONS):
+        """Fetch sourcetables of many casters at once.
+
+        Parameters
+        ----------
+        casters : iterable
+            Caster hosts, each is either a `host` string (browser `port` is used)
+            or a `(host, port)` tuple.
+        max_connections : int
+            Maximum number of transfers running at the same time.
+
+        With `scheduler` casters whose circuit is open are not requested,
+        `CircuitOpenError` is yielded for them right away.
+
+        With `parse_executor` responses of at least `parse_threshold` bytes
+        are parsed in the executor while transfers of the other casters go on.
+
+        Yields
+        ------
+        (caster, result)
+            `caster` as it was passed, `result` is either the mountpoints
+            dictionary or the `NtripbrowserError` the caster failed with.
+        """
+        addresses = {}
+        for caster in casters:
+            host, port = caster if isinstance(caster, tuple) else (caster, self.port)
+            addresses[caster] = (self._strip_scheme(host), port)
+
+        if self.scheduler is not None:
+            for caster, address in list(addresses.items()):
+                try:
+                    self.scheduler.check(*address)
+                except CircuitOpenError as error:
+                    del addresses[caster]
+                    yield caster, error
+
+        known_urls = {caster: self._known_url(*address) for caster, address in addresses.items()}
+        fetchers = {}
+        for caster, address in addresses.items():
+            urls = [known_urls[caster]] if known_urls[caster] else self._build_urls(*address)
+            fetchers[caster] = self._caster_fetcher(urls, address)
 
-    def _get_ntrip_tables(self, data):
-        ntrip_tables = self._extract_ntrip_entry_strings(data)
-        if not any(ntrip_tables):
+        fallback_fetchers = {}
+        for caster, result in MultiCasterFetcher(fetchers, max_connections).fetch():
+            if known_urls[caster] and isinstance(result, NtripbrowserError):
+                self.endpoint_cache.forget(*addresses[caster])
+                self._report_fetch(fetchers[caster], result)
+                fallback_fetchers[caster] = self._caster_fetcher(
+                    self._build_urls(*addresses[caster]), addresses[caster]
+                )
+                continue
+            yield self._remember_winner(caster, addresses[caster], fetchers[caster], result)
+
+        for caster, result in MultiCasterFetcher(fallback_fetchers, max_connections).fetch():
+            yield self._remember_winner(caster, addresses[caster], fallback_fetchers[caster], result)
+
+    def _caster_fetcher(self, urls, address):
+        connect_timeout, timeout = self._timeouts(*address)
+        stats = FetchStats(address)
+        parser_method = functools.partial(self._process_raw_data, caster=address, stats=stats)
+        return DataFetcher(
+            urls,
+            timeout,
+            parser_method,
+            cache=self.response_cache,
+            pool=self.curl_pool,
+            share=self.curl_share,
+            connect_timeout=connect_timeout,
+            stats=stats,
+            parse_submitter=functools.partial(self._submit_parse, caster=address, stats=stats),
+            response_limits=self.response_limits,
+            result_key=self._result_key(),
+        )
+
+    def _result_key(self):
+        coordinates = tuple(self.coordinates) if self.coordinates is not None else None
+        return (coordinates, self.maxdist, self.distance_mode, self.row_format)
+
+    def _submit_parse(self, raw_data, caster, stats):
+        # memoized results live in this process, small responses are cheaper to parse in place
+        if self.parse_executor is None or self.memo is not None or len(raw_data) < self.parse_threshold:
+            return None
+        settings = {
+            "coordinates": self.coordinates,
+            "maxdist": self.maxdist,
+            "distance_mode": self.distance_mode,
+            "row_format": self.row_format,
+        }
+        # memory maps of spilled responses can not be sent to workers
+        raw_data = raw_data if isinstance(raw_data, bytes) else bytes(raw_data)
+        try:
+            future = self.parse_executor.submit(
+                process_sourcetable, raw_data, caster, settings, self._caster_encodings.get(caster)
+            )
+        except (concurrent.futures.BrokenExecutor, RuntimeError):
+            logger.warning("NtripBrowser: Parse executor is not available, parsing in place")
+            return None
+        return _chain(future, functools.partial(self._merge_parsed, caster, stats))
+
+    def _merge_parsed(self, caster, stats, parsed):
+        result, encoding, parse_times = parsed
+        if encoding is not None:
+            self._caster_encodings[caster] = encoding
+        for phase, seconds in parse_times.items():
+            stats.parse_times[phase] = stats.parse_times.get(phase, 0) + seconds
+        return result
+
+    def _remember_winner(self, caster, address, fetcher, result):
+        if self.endpoint_cache is not None and fetcher.winning_url:
+            self.endpoint_cache.set(*address, fetcher.winning_url)
+        if self.scheduler is not None:
+            self._record_outcome(*address, fetcher, result)
+        self._report_fetch(fetcher, result)
+        return caster, result
+
+    def _report_fetch(self, fetcher, result):
+        if isinstance(result, NtripbrowserError):
+            fetcher.stats.error = result
+        self._report_stats(fetcher.stats)
+
+    def iter_mountpoints(self):
+        """Yield `(table, row)` pairs while the sourcetable is being downloaded.
+
+        `table` is one of "str", "cas" or "net", `row` is a dictionary, or
+        a record with the "record" `row_format`, of the same structure as in
+        `get_mountpoints` result. Rows are yielded in the sourcetable order,
+        which means that with `maxdist` outlying rows are skipped, but the
+        rest are not sorted by distance. Only transfer timings are recorded
+        in `stats`, rows are parsed one by one while they arrive.
+
+        Raises
+        ------
+        ValueError
+            With the columnar "numpy" and "arrow" row formats.
+        """
+        if self.row_format in (ROW_FORMAT_NUMPY, ROW_FORMAT_ARROW):
+            raise ValueError(f"iter_mountpoints does not support the {self.row_format!r} row format")
+        return self._iter_mountpoints()
+
+    def _iter_mountpoints(self):
+        caster = (self.host, self.port)
+        stats = FetchStats(caster)
+        fetcher = StreamingFetcher(
+            self._preferred_urls(),
+            self.timeout,
+            self._fetcher.stagger_delay,
+            self.curl_pool,
+            self.curl_share,
+            stats,
+            self.response_limits,
+            self._caster_encodings.get(caster),
+        )
+        form_row, locate = self._row_former(), self._row_locator()
+        try:
+            for table, line in fetcher.iter_records():
+                row = form_row(table, line)
+                if locate(row):
+                    yield table, row
+        except NtripbrowserError as error:
+            stats.error = error
+            raise
+        finally:
+            if fetcher.encoding is not None:
+                self._caster_encodings[caster] = fetcher.encoding
+            self._report_stats(stats)
+        self.winning_url = fetcher.winning_url
+
+    def _process_raw_data(self, raw_data, caster=None, stats=None):
+        if self.memo is not None:
+            return self._process_memoized(raw_data, caster, stats)
+        ntrip_dictionary = self._locate(self._parse_raw_data(raw_data, caster, stats), stats)
+        with timed(stats, "export"):
+            return self._export(ntrip_dictionary)
+
+    def _parse_raw_data(self, raw_data, caster=None, stats=None):
+        with timed(stats, "decode"):
+            decoded_raw_ntrip = self._decode_data(raw_data, caster or (self.host, self.port))
+        with timed(stats, "parse"):
+            return self._form_ntrip_entries(decoded_raw_ntrip)
+
+    def _process_memoized(self, raw_data, caster=None, stats=None):
+        digest = self.memo.digest(raw_data)
+        result_key = (digest, *self._result_key())
+        result = self.memo.get_result(result_key)
+        if result is not None:
+            return result
+
+        entries_key = (digest, self.row_format)
+        ntrip_dictionary = self.memo.get_entries(entries_key)
+        if ntrip_dictionary is None:
+            ntrip_dictionary = self._parse_raw_data(raw_data, caster, stats)
+            self.memo.set_entries(entries_key, ntrip_dictionary)
+        # distances are added to the copies to keep memoized entries intact
+        ntrip_dictionary = {key: [row.copy() for row in rows] for key, rows in ntrip_dictionary.items()}
+        ntrip_dictionary = self._locate(ntrip_dictionary, stats)
+        with timed(stats, "export"):
+            result = self._export(ntrip_dictionary)
+        self.memo.set_result(result_key, result)
+        return result
+
+    def _decode_data(self, data, caster):
+        """Decode the sourcetable, detecting its encoding only when it is not UTF-8.
+
+        Pure ASCII and UTF-8 sourcetables are decoded right away. Otherwise
+        the encoding remembered for the caster is tried, then the encoding
+        is detected on a bounded sample starting at the first non UTF-8 byte.
+        `data` is any bytes-like object, memory maps are decoded without copying.
+        """
+        try:
+            return str(data, "utf8")
+        except UnicodeDecodeError as error:
+            first_invalid_byte = error.start
+
+        encoding = self._caster_encodings.get(caster)
+        if encoding is not None:
+            try:
+                return str(data, encoding)
+            except UnicodeDecodeError:
+                pass
+
+        import cchardet
+
+        sample = data[first_invalid_byte : first_invalid_byte + ENCODING_DETECTION_SAMPLE_SIZE]
+        encoding = cchardet.detect(sample)["encoding"] or "utf8"
+        logger.debug("%s: Detected %s encoding", caster, encoding)
+        self._caster_encodings[caster] = encoding
+        return str(data, encoding, "replace")
+
+    def _form_ntrip_entries(self, data):
+        """Classify sourcetable lines and form rows in a single pass.
+
+        Lines are split as `str.splitlines` does, a chunk of the text at a
+        time, and classified by their `STR;`, `CAS;` or `NET;` prefix.
+        Every record line is split once and its row is appended to its table
+        right away, dictionary rows are built by `_dict_row_builder`.
+        """
+        ntrip_dictionary = {"str": [], "cas": [], "net": []}
+        tables = {
+            f"{table.upper()};": (ntrip_dictionary[table].append, len(headers) - 1, self._row_builder(headers))
+            for table, headers in NTRIP_TABLE_HEADERS.items()
+        }
+        for line in _split_lines(data):
+            table = tables.get(line[:4])
+            if table is not None:
+                append, size, build_row = table
+                append(build_row(line[4:].split(";", size)))
+                continue
+            # record lines without a separator after their type, e.g. a bare STR
+            table = tables.get(line[:3] + ";")
+            if table is not None:
+                append, size, build_row = table
+                append(build_row(line.split(";", size + 1)[1:]))
+        if not any(ntrip_dictionary.values()):
             raise NoDataReceivedFromCaster()
-        return ntrip_tables
+        return ntrip_dictionary
 
-    @staticmethod
-    def _extract_ntrip_entry_strings(raw_table):
-        str_list, cas_list, net_list = [], [], []
-        for row in raw_table.splitlines():
-            if row.startswith("STR"):
-                str_list.append(row)
-            elif row.startswith("CAS"):
-                cas_list.append(row)
-            elif row.startswith("NET"):
-                net_list.append(row)
-        return str_list, cas_list, net_list
-
-    def _form_ntrip_entries(self, ntrip_tables):
-        return {
-            "str": self._form_dictionaries(STR_HEADERS, ntrip_tables[0]),
-            "cas": self._form_dictionaries(CAS_HEADERS, ntrip_tables[1]),
-            "net": self._form_dictionaries(NET_HEADERS, ntrip_tables[2]),
+    def _row_builder(self, headers):
+        """Return a function forming a row from the values of a split line, see `_dict_row_builder`."""
+        # lines hold values of all the headers but the trailing Distance
+        fields = headers[:-1]
+        if self.row_format == ROW_FORMAT_DICT:
+            return _dict_row_builder(fields)
+        # columnar formats are exported from records, which keep fields of the split lines as they are
+        record_type = RECORD_TYPES[headers]
+        return lambda values: record_type(values[: len(fields)])
+
+    def _row_former(self):
+        """Return a function forming the row of a `(table, line)` record, as `_form_ntrip_entries` does."""
+        builders = {
+            table: (len(headers) - 1, self._row_builder(headers)) for table, headers in NTRIP_TABLE_HEADERS.items()
         }
 
-    @staticmethod
-    def _form_dictionaries(headers, line_list):
-        if headers == STR_HEADERS:
-            for line in line_list:
-                print(line)
+        def form_row(table, line):
+            size, build_row = builders[table]
+            if line[3:4] == ";":
+                return build_row(line[4:].split(";", size))
+            return build_row(line.split(";", size + 1)[1:])
+
+        return form_row
+
+    def _export(self, ntrip_dictionary):
+        if self.row_format not in (ROW_FORMAT_NUMPY, ROW_FORMAT_ARROW):
+            return ntrip_dictionary
+        from . import columnar
+
+        export = columnar.to_numpy if self.row_format == ROW_FORMAT_NUMPY else columnar.to_arrow
+        return {key: export(NTRIP_TABLE_HEADERS[key], rows) for key, rows in ntrip_dictionary.items()}
+
+    def _locate(self, ntrip_dictionary, stats=None):
+        if self.distance_mode == DISTANCE_MODE_FAST:
+            with timed(stats, "distance"):
+                return {key: self._locate_fast(rows) for key, rows in ntrip_dictionary.items()}
+        with timed(stats, "distance"):
+            if self._trimming:
+                ntrip_dictionary = {key: self._prefilter_outlying(rows) for key, rows in ntrip_dictionary.items()}
+            ntrip_dictionary = self._add_distance(ntrip_dictionary)
+        with timed(stats, "trim"):
+            return self._trim_outlying(ntrip_dictionary)
+
+    def _row_locator(self):
+        """Return a function adding `Distance` to a row, which returns False for rows beyond `maxdist`.
+
+        Rows are located as `_locate` does, but one at a time. The observer
+        point and the `maxdist` bounding box are prepared once.
+        """
+        if self.distance_mode == DISTANCE_MODE_FAST:
+            return self._fast_row_locator()
+        from . import distance
+
+        point = [distance.to_float(coordinate) for coordinate in self.coordinates or ()]
+        box = distance.bounding_box(point, self.maxdist) if self._trimming and None not in point else None
+
+        def locate(row):
+            if box is not None and not distance.point_inside_bounding_box(*distance.parse_coordinate(row), point, box):
+                return False
+            latlon = self._get_float_coordinates((row.get("Latitude"), row.get("Longitude")))
+            row["Distance"] = self._get_distance(latlon)
+            return not self._trimming or (row["Distance"] is not None and row["Distance"] < self.maxdist)
+
+        return locate
+
+    def _fast_row_locator(self):
+        from . import distance
+
+        point = [distance.to_float(coordinate) for coordinate in self.coordinates or ()]
+        point_is_valid = bool(point) and None not in point
+        box = distance.bounding_box(point, self.maxdist) if self._trimming and point_is_valid else None
+
+        def locate(row):
+            coordinate = distance.parse_coordinate(row)
+            if box is not None and not distance.point_inside_bounding_box(*coordinate, point, box):
+                return False
+            station_distance = distance.fast_distance(*coordinate, point) if point_is_valid else None
+            if station_distance is None or math.isnan(station_distance):
+                row["Distance"] = None
+                return not self._trimming
+            row["Distance"] = station_distance
+            return not self._trimming or station_distance < self.maxdist
+
+        return locate
+
+    def _prefilter_outlying(self, ntrip_type_dictionary):
+        """Drop stations outside of the maxdist bounding box before computing exact distances."""
+        from . import distance
 
-        def form_line(index):
-            line = index.split(";", len(headers))[1:]
-            return dict(list(zip(headers, line)))
+        point = [distance.to_float(coordinate) for coordinate in self.coordinates]
+        if None in point:
+            return ntrip_type_dictionary
+        box = distance.bounding_box(point, self.maxdist)
+        latitudes, longitudes = distance.parse_coordinates(ntrip_type_dictionary)
+        inside = distance.inside_bounding_box(latitudes, longitudes, point, box)
+        return [station for station, is_inside in zip(ntrip_type_dictionary, inside) if is_inside]
 
-        new_lines = [form_line(i) for i in line_list]
-        for line in new_lines:
-            if not line.get("Latitude") or not line.get("Longitude"):
-                print(line)
-        return new_lines
+    def _locate_fast(self, ntrip_type_dictionary):
+        from . import distance
+
+        point = [distance.to_float(coordinate) for coordinate in self.coordinates or ()]
+        if not point or None in point:
+            for station in ntrip_type_dictionary:
+                station["Distance"] = None
+            return self._trim_outlying_casters(ntrip_type_dictionary) if self._trimming else ntrip_type_dictionary
+
+        distances = distance.fast_distances(*distance.parse_coordinates(ntrip_type_dictionary), point)
+        if self._trimming:
+            indices = distance.inlying_indices(distances, self.maxdist)
+            ntrip_type_dictionary = [ntrip_type_dictionary[index] for index in indices]
+            distances = [distances[index] for index in indices]
+        for station, station_distance in zip(ntrip_type_dictionary, list(distances)):
+            station["Distance"] = None if math.isnan(station_distance) else float(station_distance)
+        return ntrip_type_dictionary
+
+    @property
+    def _trimming(self):
+        return (self.maxdist is not None) and (self.coordinates is not None)
 
     def _add_distance(self, ntrip_dictionary):
-        return {
-            "cas": self._add_distance_column(ntrip_dictionary.get("cas")),
-            "net": self._add_distance_column(ntrip_dictionary.get("net")),
-            "str": self._add_distance_column(ntrip_dictionary.get("str")),
-        }
+        return {key: self._add_distance_column(rows) for key, rows in ntrip_dictionary.items()}
 
     def _add_distance_column(self, ntrip_type_dictionary):
         for station in ntrip_type_dictionary:
@@ -309,6 +1421,8 @@ class NtripBrowser:
         if obs_point == NULL_ISLAND_COORDS:
             return None
 
+        from geopy.distance import geodesic
+
         try:
             return geodesic(obs_point, self.coordinates).kilometers
         except ValueError:
@@ -317,12 +1431,8 @@ class NtripBrowser:
         return None
 
     def _trim_outlying(self, ntrip_dictionary):
-        if (self.maxdist is not None) and (self.coordinates is not None):
-            return {
-                "cas": self._trim_outlying_casters(ntrip_dictionary.get("cas")),
-                "net": self._trim_outlying_casters(ntrip_dictionary.get("net")),
-                "str": self._trim_outlying_casters(ntrip_dictionary.get("str")),
-            }
+        if self._trimming:
+            return {key: self._trim_outlying_casters(rows) for key, rows in ntrip_dictionary.items()}
         return ntrip_dictionary
 
     def _trim_outlying_casters(self, ntrip_type_dictionary):
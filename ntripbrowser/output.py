@@ -0,0 +1,111 @@
+"""Machine readable CLI output, written row by row as rows arrive."""
+
+import csv
+import json
+import os
+import sys
+
+from .constants import NTRIP_TABLE_HEADERS, WATCH_EVENT_ADDED, WATCH_EVENT_MODIFIED, WATCH_EVENT_REMOVED
+from .watch import changed_fields
+
+TYPE_COLUMN = "Type"
+EVENT_COLUMN = "Event"
+
+
+def default_columns(tables):
+    """Return `Type` followed by the columns of the selected `tables`."""
+    columns = [TYPE_COLUMN]
+    for table in tables:
+        columns.extend(header for header in NTRIP_TABLE_HEADERS[table] if header not in columns)
+    return columns
+
+
+def event_columns(tables):
+    """Return the default columns of watch events, `Event` follows `Type`."""
+    columns = default_columns(tables)
+    columns.insert(1, EVENT_COLUMN)
+    return columns
+
+
+def event_row(event):
+    """Return the row of a `WatchEvent` with its kind in the `Event` field."""
+    return {EVENT_COLUMN: event.kind, **event.row}
+
+
+def format_event(event):
+    """Return a human readable line of a `WatchEvent`, modifications list the changed fields."""
+    key = ":".join(map(str, event.key)) if isinstance(event.key, tuple) else event.key
+    line = f"{EVENT_SYMBOLS[event.kind]} {event.table.upper()} {key}"
+    if event.previous is not None:
+        changes = (
+            f"{field}: {event.previous.get(field)!r} -> {event.row.get(field)!r}"
+            for field in changed_fields(event.previous, event.row)
+        )
+        line = "; ".join([line, *changes])
+    return line
+
+
+def project_row(table, row, columns=None):
+    """Return `row` as a dictionary of `columns`, `Type` being the table of the row
+    ("STR", "CAS" or "NET").
+
+    Without `columns` `Type` is followed by all of the fields the row has.
+    """
+    if columns is None:
+        return {TYPE_COLUMN: table.upper(), **row}
+    return {column: table.upper() if column == TYPE_COLUMN else row.get(column) for column in columns}
+
+
+class JsonLinesWriter:
+    """Write every row as a JSON object on its own line."""
+
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.columns = columns
+
+    def write(self, table, row):
+        self.stream.write(json.dumps(project_row(table, row, self.columns), ensure_ascii=False) + "\n")
+
+    def close(self):
+        pass
+
+
+class JsonWriter(JsonLinesWriter):
+    """Write rows as one JSON array, element by element."""
+
+    def __init__(self, stream, columns):
+        super().__init__(stream, columns)
+        self._separator = "[\n"
+
+    def write(self, table, row):
+        self.stream.write(self._separator + json.dumps(project_row(table, row, self.columns), ensure_ascii=False))
+        self._separator = ",\n"
+
+    def close(self):
+        self.stream.write("[]\n" if self._separator == "[\n" else "\n]\n")
+
+
+class CsvWriter:
+    """Write rows as CSV with a header line, missing fields are left empty."""
+
+    def __init__(self, stream, columns):
+        self.stream = stream
+        self.columns = columns
+        self._writer = csv.writer(stream, lineterminator="\n")
+        self._writer.writerow(columns)
+
+    def write(self, table, row):
+        self._writer.writerow(project_row(table, row, self.columns).values())
+
+    def close(self):
+        pass
+
+
+def discard_stdout():
+    """Point stdout to devnull after its reader has gone, e.g. `| head`,
+    so that the interpreter does not fail flushing it at exit."""
+    os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+
+EVENT_SYMBOLS = {WATCH_EVENT_ADDED: "+", WATCH_EVENT_REMOVED: "-", WATCH_EVENT_MODIFIED: "~"}
+WRITERS = {"json": JsonWriter, "jsonl": JsonLinesWriter, "csv": CsvWriter}
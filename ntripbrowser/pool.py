@@ -0,0 +1,123 @@
+import logging
+import threading
+import time
+
+import pycurl
+
+from .constants import CURL_POOL_IDLE_TIMEOUT, CURL_POOL_MAX_SIZE
+from .share import CurlShareCache
+
+logger = logging.getLogger(__name__)
+
+
+class CurlPool:
+    """Reusable curl handles which keep connections warm between fetches.
+
+    By default every thread has its own idle handles attached to its own
+    `CurlShareCache`, which shares the DNS cache, TLS sessions and the
+    connection cache between them, so polling the same caster again reuses
+    its resolved address and open connection or at least resumes the TLS
+    session. libcurl does not share connections across threads, so handles
+    and connections are not passed between threads, but one pool may still
+    be used by many browsers and threads. Idle handles and the share of a
+    thread are closed once the thread has ended.
+
+    Parameters
+    ----------
+    max_size : int
+        Maximum number of idle handles kept per thread, the least recently
+        used ones are closed above it.
+    idle_timeout : float
+        Seconds after which idle handles are closed, it also limits the age
+        of idle connections kept by libcurl.
+    share : CurlShareCache or None
+        Share to attach handles of all threads to, e.g. `default_share()` to
+        share caches with fetchers outside of the pool. Connections are
+        reused across fetches only if it shares them, which confines the pool
+        to the thread the share is created in.
+    """
+
+    def __init__(self, max_size=CURL_POOL_MAX_SIZE, idle_timeout=CURL_POOL_IDLE_TIMEOUT, share=None):
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self._lock = threading.Lock()
+        self._idle = {}
+        self._threads = {}
+        self._share = share
+        self._shares = {}
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(idle) for idle in self._idle.values())
+
+    @property
+    def share(self):
+        """Share the handles of the calling thread are attached to."""
+        if self._share is not None:
+            return self._share
+        thread = threading.get_ident()
+        with self._lock:
+            if thread not in self._shares:
+                logger.debug("CurlPool: Creating share for thread %s", thread)
+                self._shares[thread] = CurlShareCache(connections=True)
+            return self._shares[thread]
+
+    def acquire(self):
+        """Return an idle handle of the calling thread or a new one when there are none."""
+        # registers threads not started by `threading`, so that they are not taken for ended ones
+        thread = threading.current_thread().ident
+        with self._lock:
+            self._evict_expired()
+            self._close_ended_threads()
+            idle = self._idle.get(thread)
+            curl = idle.pop()[0] if idle else None
+        if curl is None:
+            logger.debug("CurlPool: Creating new curl")
+            curl = pycurl.Curl()
+            self.share.attach(curl)
+            with self._lock:
+                self._threads[curl] = thread
+        curl.setopt(pycurl.MAXAGE_CONN, int(self.idle_timeout))
+        return curl
+
+    def release(self, curl):
+        """Take the handle back, its options are reset, connections and caches are kept."""
+        curl.reset()
+        with self._lock:
+            idle = self._idle.setdefault(self._threads[curl], [])
+            idle.append((curl, time.monotonic()))
+            self._evict_expired()
+            while len(idle) > self.max_size:
+                self._close(idle.pop(0)[0])
+
+    def close(self):
+        with self._lock:
+            for idle in self._idle.values():
+                for curl, _ in idle:
+                    self._close(curl)
+            self._idle = {}
+            for share in self._shares.values():
+                share.close()
+            self._shares = {}
+
+    def _close(self, curl):
+        del self._threads[curl]
+        curl.close()
+
+    def _close_ended_threads(self):
+        alive = {thread.ident for thread in threading.enumerate()}
+        for thread in [thread for thread in self._idle if thread not in alive]:
+            for curl, _ in self._idle.pop(thread):
+                self._close(curl)
+        # handles in use are closed after they are released, their share after them
+        in_use = set(self._threads.values())
+        for thread in [thread for thread in self._shares if thread not in alive and thread not in in_use]:
+            logger.debug("CurlPool: Closing share of ended thread %s", thread)
+            self._shares.pop(thread).close()
+
+    def _evict_expired(self):
+        deadline = time.monotonic() - self.idle_timeout
+        for idle in self._idle.values():
+            while idle and idle[0][1] < deadline:
+                logger.debug("CurlPool: Closing idle curl")
+                self._close(idle.pop(0)[0])
@@ -0,0 +1,148 @@
+from collections.abc import MutableMapping
+from typing import ClassVar
+
+from .constants import CAS_HEADERS, NET_HEADERS, STR_HEADERS
+
+
+class _Missing:
+    """Value of a header field which is deleted from a record or set after its last field."""
+
+    __slots__ = ()
+
+    def __reduce__(self):
+        return "_MISSING"
+
+    def __repr__(self):
+        return "<missing>"
+
+
+_MISSING = _Missing()
+
+
+class NtripRecord(MutableMapping):
+    """Compact sourcetable row with a mapping interface.
+
+    Field values are kept in one tuple in the headers order and `Distance`
+    in its own slot, so a row costs two small objects instead of a dict
+    with an entry per header. As with dictionary rows, fields missing in
+    the sourcetable line are missing in the record.
+
+    Records may be changed as dictionaries are. Keys other than the headers
+    are kept in a dictionary created on first change of a record beyond its
+    fields. Only then may the values have gaps of deleted fields, so rows
+    as they are parsed are iterated without looking for gaps. Iteration
+    yields the header fields in the headers order, then `Distance`, then
+    the other keys.
+    """
+
+    __slots__ = ("_distance", "_extra", "_values")
+
+    HEADERS = ()
+    _INDEX: ClassVar[dict[str, int]] = {}
+
+    def __init__(self, values):
+        self._values = tuple(values)
+        self._extra = None
+
+    def __getitem__(self, key):
+        if key == "Distance":
+            try:
+                return self._distance
+            except AttributeError:
+                raise KeyError(key) from None
+        index = self._INDEX.get(key)
+        if index is None:
+            if self._extra is None:
+                raise KeyError(key)
+            return self._extra[key]
+        if index >= len(self._values) or self._values[index] is _MISSING:
+            raise KeyError(key)
+        return self._values[index]
+
+    def __setitem__(self, key, value):
+        if key == "Distance":
+            self._distance = value
+            return
+        index = self._INDEX.get(key)
+        if index is None:
+            self._extras()[key] = value
+            return
+        values = self._values
+        if index >= len(values):
+            self._extras()
+            values += (_MISSING,) * (index + 1 - len(values))
+        self._values = values[:index] + (value,) + values[index + 1 :]
+
+    def __delitem__(self, key):
+        if key == "Distance":
+            if not hasattr(self, "_distance"):
+                raise KeyError(key)
+            del self._distance
+            return
+        index = self._INDEX.get(key)
+        if index is None:
+            if self._extra is None:
+                raise KeyError(key)
+            del self._extra[key]
+            return
+        values = self._values
+        if index >= len(values) or values[index] is _MISSING:
+            raise KeyError(key)
+        self._extras()
+        self._values = values[:index] + (_MISSING,) + values[index + 1 :]
+
+    def __iter__(self):
+        if self._extra is None:
+            yield from self.HEADERS[: len(self._values)]
+        else:
+            yield from (header for header, value in zip(self.HEADERS, self._values) if value is not _MISSING)
+        if hasattr(self, "_distance"):
+            yield "Distance"
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self):
+        if self._extra is None:
+            return len(self._values) + hasattr(self, "_distance")
+        return len(self._values) - self._values.count(_MISSING) + hasattr(self, "_distance") + len(self._extra)
+
+    def __repr__(self):
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def copy(self):
+        record = type(self)(self._values)
+        if hasattr(self, "_distance"):
+            record._distance = self._distance
+        if self._extra is not None:
+            record._extra = self._extra.copy()
+        return record
+
+    def _extras(self):
+        if self._extra is None:
+            self._extra = {}
+        return self._extra
+
+
+def _index(headers):
+    return {header: index for index, header in enumerate(headers) if header != "Distance"}
+
+
+class StrRecord(NtripRecord):
+    __slots__ = ()
+    HEADERS = STR_HEADERS
+    _INDEX = _index(STR_HEADERS)
+
+
+class CasRecord(NtripRecord):
+    __slots__ = ()
+    HEADERS = CAS_HEADERS
+    _INDEX = _index(CAS_HEADERS)
+
+
+class NetRecord(NtripRecord):
+    __slots__ = ()
+    HEADERS = NET_HEADERS
+    _INDEX = _index(NET_HEADERS)
+
+
+RECORD_TYPES = {STR_HEADERS: StrRecord, CAS_HEADERS: CasRecord, NET_HEADERS: NetRecord}
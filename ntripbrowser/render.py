@@ -0,0 +1,111 @@
+"""Fixed-width text rendering of sourcetable rows for the CLI table view."""
+
+import contextlib
+import itertools
+import os
+import subprocess
+import sys
+
+from .output import discard_stdout
+
+COLUMN_SEPARATOR = " | "
+TRUNCATION_MARK = "~"
+MIN_COLUMN_WIDTH = 8
+
+
+def render_table(rows, headers, width, chunk_size=None):
+    """Yield lines of a fixed-width table of `rows` fitting into `width` characters.
+
+    Column widths are computed in one pass over the rows, overlong values are
+    truncated. With `chunk_size` rows are rendered in chunks of that many rows,
+    each with its own widths and header, so the first lines come right away
+    and `rows` may be any iterable.
+    """
+    if chunk_size is None:
+        chunks = [list(rows)]
+    else:
+        rows = iter(rows)
+        chunks = iter(lambda: list(itertools.islice(rows, chunk_size)), [])
+    for chunk in chunks:
+        cells = [[format_cell(row.get(header)) for header in headers] for row in chunk]
+        widths = fit_widths(column_widths(headers, cells), width - len(COLUMN_SEPARATOR) * (len(headers) - 1))
+        yield format_line(headers, widths)
+        yield "-" * (sum(widths) + len(COLUMN_SEPARATOR) * (len(headers) - 1))
+        for line in cells:
+            yield format_line(line, widths)
+
+
+def column_widths(headers, cells):
+    widths = [len(header) for header in headers]
+    for line in cells:
+        widths = [max(width, len(cell)) for width, cell in zip(widths, line)]
+    return widths
+
+
+def fit_widths(widths, available):
+    """Shrink the widest columns until all of them fit into `available` characters.
+
+    Columns are not shrunk below `MIN_COLUMN_WIDTH`, lines of tables with
+    many columns may be wider than `available` then.
+    """
+    if sum(widths) <= available:
+        return widths
+    # the largest limit on a column width which keeps the total within `available`
+    limit, remaining = 1, available
+    for index, width in enumerate(sorted(widths)):
+        columns_left = len(widths) - index
+        if width * columns_left > remaining:
+            limit = max(remaining // columns_left, 1)
+            break
+        remaining -= width
+    return [min(width, max(limit, MIN_COLUMN_WIDTH)) for width in widths]
+
+
+def format_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, float):
+        return f"{value:.3f}"
+    return str(value)
+
+
+def format_line(cells, widths):
+    return COLUMN_SEPARATOR.join(truncate(cell, width).ljust(width) for cell, width in zip(cells, widths)).rstrip()
+
+
+def truncate(cell, width):
+    if len(cell) <= width:
+        return cell
+    return cell[: width - 1] + TRUNCATION_MARK if width > 1 else TRUNCATION_MARK
+
+
+@contextlib.contextmanager
+def pager_stream():
+    """Yield a text stream writing to the pager, lines show up as soon as they are written.
+
+    Output goes straight to stdout when it is not a terminal or the pager
+    cannot be started. Quitting the pager or closing the pipe early ends
+    writing silently.
+    """
+    command = os.environ.get("MANPAGER") or os.environ.get("PAGER") or "less"
+    process = None
+    if sys.stdout.isatty() and command != "cat":
+        env = dict(os.environ)
+        # lines wider than the screen are chopped and scrolled horizontally
+        env.setdefault("LESS", "-FRSX")
+        with contextlib.suppress(OSError):
+            process = subprocess.Popen(command, shell=True, stdin=subprocess.PIPE, env=env, text=True, errors="replace")
+    if process is None:
+        try:
+            yield sys.stdout
+        except BrokenPipeError:
+            discard_stdout()
+        return
+    try:
+        yield process.stdin
+    except BrokenPipeError:
+        pass
+    finally:
+        with contextlib.suppress(BrokenPipeError):
+            process.stdin.close()
+        process.wait()
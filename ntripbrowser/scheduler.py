@@ -0,0 +1,160 @@
+import logging
+import math
+import threading
+import time
+from collections import deque
+
+from .constants import (
+    SCHEDULER_BACKOFF,
+    SCHEDULER_FAILURE_THRESHOLD,
+    SCHEDULER_HISTORY_SIZE,
+    SCHEDULER_MAX_BACKOFF,
+    SCHEDULER_MAX_TIMEOUT,
+    SCHEDULER_MIN_SAMPLES,
+    SCHEDULER_MIN_TIMEOUT,
+    SCHEDULER_PERCENTILE,
+    SCHEDULER_TIMEOUT_FACTOR,
+)
+from .exceptions import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+class CasterHistory:
+    """Latencies and failures observed for one caster."""
+
+    def __init__(self, history_size):
+        self.connect_times = deque(maxlen=history_size)
+        self.total_times = deque(maxlen=history_size)
+        self.failures = 0
+        self.open_until = 0
+        self.probe_until = 0
+
+
+class CasterScheduler:
+    """Per caster timeouts derived from observed latencies, with a circuit breaker.
+
+    Once a caster has answered `min_samples` times, its total timeout is
+    `factor` times the `percentile` of its last `history_size` response
+    times and its connect timeout is derived from connect times in the same
+    way, both limited to `[min_timeout, max_timeout]`. Until then the browser
+    `timeout` is used.
+
+    After `failure_threshold` consecutive `UnableToConnect` or
+    `ExceededTimeoutError` failures the circuit of the caster opens: it is
+    not requested for `backoff` seconds, doubled on every next failure up to
+    `max_backoff`. When the time is over the circuit is half-open: one probe
+    request is let through and the other ones fail until its outcome is
+    recorded, its success closes the circuit, its failure opens it again and
+    any other outcome, see `release`, lets the next request probe it.
+    A probe whose outcome is not recorded within `max_timeout` seconds is
+    given up and the next request is let through. One scheduler may be
+    shared by many browsers and threads.
+    """
+
+    def __init__(
+        self,
+        history_size=SCHEDULER_HISTORY_SIZE,
+        min_samples=SCHEDULER_MIN_SAMPLES,
+        percentile=SCHEDULER_PERCENTILE,
+        factor=SCHEDULER_TIMEOUT_FACTOR,
+        min_timeout=SCHEDULER_MIN_TIMEOUT,
+        max_timeout=SCHEDULER_MAX_TIMEOUT,
+        failure_threshold=SCHEDULER_FAILURE_THRESHOLD,
+        backoff=SCHEDULER_BACKOFF,
+        max_backoff=SCHEDULER_MAX_BACKOFF,
+    ):
+        self.history_size = history_size
+        self.min_samples = min_samples
+        self.percentile = percentile
+        self.factor = factor
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self._lock = threading.Lock()
+        self._casters = {}
+
+    def _history(self, host, port):
+        key = (host, port)
+        if key not in self._casters:
+            self._casters[key] = CasterHistory(self.history_size)
+        return self._casters[key]
+
+    def timeouts(self, host, port, default):
+        """Return `(connect_timeout, timeout)` in seconds for the next request to the caster."""
+        with self._lock:
+            history = self._history(host, port)
+            total_times, connect_times = list(history.total_times), list(history.connect_times)
+        if len(total_times) < self.min_samples:
+            return default, default
+        timeout = self._limit(self._percentile(total_times) * self.factor)
+        if len(connect_times) < self.min_samples:
+            return timeout, timeout
+        return min(self._limit(self._percentile(connect_times) * self.factor), timeout), timeout
+
+    def check(self, host, port):
+        """Raise `CircuitOpenError` while the circuit of the caster is open or another request probes it."""
+        now = time.monotonic()
+        with self._lock:
+            history = self._history(host, port)
+            if now < history.open_until:
+                raise CircuitOpenError(f"{host}:{port} is not requested for {history.open_until - now:.0f} s")
+            if history.failures < self.failure_threshold:
+                return
+            if now < history.probe_until:
+                raise CircuitOpenError(f"{host}:{port} is being probed by another request")
+            history.probe_until = now + self.max_timeout
+
+    def record_success(self, host, port, connect_time=None, total_time=None):
+        """Record a successful fetch and its latencies.
+
+        `connect_time` is None for reused connections, both are None for
+        responses served without a request, e.g. from a cache.
+        """
+        with self._lock:
+            history = self._history(host, port)
+            if connect_time is not None:
+                history.connect_times.append(connect_time)
+            if total_time is not None:
+                history.total_times.append(total_time)
+            history.failures = 0
+            history.open_until = 0
+            history.probe_until = 0
+
+    def release(self, host, port):
+        """Record an outcome which tells nothing about availability of the caster, e.g. an invalid response.
+
+        Failures are kept as they are, only the probe of the caster is over.
+        """
+        with self._lock:
+            self._history(host, port).probe_until = 0
+
+    def record_failure(self, host, port):
+        with self._lock:
+            history = self._history(host, port)
+            history.failures += 1
+            history.probe_until = 0
+            excess = history.failures - self.failure_threshold
+            if excess >= 0:
+                backoff = min(self.backoff * 2 ** min(excess, 32), self.max_backoff)
+                history.open_until = time.monotonic() + backoff
+                logger.info(
+                    "CasterScheduler: %s:%s failed %d times, backing off for %s s",
+                    host,
+                    port,
+                    history.failures,
+                    backoff,
+                )
+
+    def failures(self, host, port):
+        with self._lock:
+            return self._history(host, port).failures
+
+    def _percentile(self, values):
+        values = sorted(values)
+        return values[max(math.ceil(len(values) * self.percentile / 100) - 1, 0)]
+
+    def _limit(self, timeout):
+        return min(max(timeout, self.min_timeout), self.max_timeout)
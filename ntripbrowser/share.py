@@ -0,0 +1,96 @@
+import logging
+import threading
+
+import pycurl
+
+from .constants import SHARE_DNS_HIT_TIME
+
+logger = logging.getLogger(__name__)
+
+
+class CurlShareCache:
+    """DNS cache, TLS sessions and optionally connections shared by curls of many fetchers.
+
+    Every curl attached to the share resolves a caster host once and resumes
+    TLS sessions of the other curls, including those of other browsers.
+    Access to this data is locked by pycurl, so curls of one share may run
+    in different threads.
+
+    With `connections` curls also reuse connections left open by the other
+    curls. libcurl does not support sharing connections between threads, so
+    such a share may be used only by the thread which has created it,
+    attaching curls in another thread raises `RuntimeError`.
+
+    Attributes
+    ----------
+    stats : dict
+        Counters of the finished transfers:
+        `transfers`, `connections_reused`, `connections_created`,
+        `estimated_dns_hits` and `estimated_dns_misses`. libcurl does not
+        tell whether a name is resolved from its cache, so DNS hits are
+        estimated: a transfer over a reused connection is a hit and so is
+        a name lookup shorter than `SHARE_DNS_HIT_TIME`, which a fast
+        resolver, e.g. of the hosts file, may answer as well.
+    """
+
+    def __init__(self, connections=False):
+        self.connections = connections
+        self._thread = threading.get_ident()
+        self._share = pycurl.CurlShare()
+        shared_data = [pycurl.LOCK_DATA_DNS, pycurl.LOCK_DATA_SSL_SESSION]
+        if connections:
+            shared_data.append(pycurl.LOCK_DATA_CONNECT)
+        for data in shared_data:
+            self._share.setopt(pycurl.SH_SHARE, data)
+        self._lock = threading.Lock()
+        self._stats = self._empty_stats()
+
+    @staticmethod
+    def _empty_stats():
+        return dict.fromkeys(
+            ("transfers", "connections_reused", "connections_created", "estimated_dns_hits", "estimated_dns_misses"), 0
+        )
+
+    @property
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = self._empty_stats()
+
+    def attach(self, curl):
+        """Attach a new curl to the share, a curl can be attached only once."""
+        if self.connections and threading.get_ident() != self._thread:
+            raise RuntimeError("CurlShareCache sharing connections is used by another thread")
+        curl.setopt(pycurl.SHARE, self._share)
+
+    def record(self, curl):
+        """Count the connection and the estimated name lookup outcome of the transfer `curl` has finished."""
+        reused = curl.getinfo(pycurl.NUM_CONNECTS) == 0
+        dns_hit = reused or curl.getinfo(pycurl.NAMELOOKUP_TIME) < SHARE_DNS_HIT_TIME
+        with self._lock:
+            self._stats["transfers"] += 1
+            self._stats["connections_reused" if reused else "connections_created"] += 1
+            self._stats["estimated_dns_hits" if dns_hit else "estimated_dns_misses"] += 1
+
+    def close(self):
+        self._share.close()
+
+
+_default_share = None
+_default_share_lock = threading.Lock()
+
+
+def default_share():
+    """Return the process-wide `CurlShareCache`, it is created on the first call.
+
+    It shares DNS entries and TLS sessions but not connections, so it may be used by any thread.
+    """
+    global _default_share
+    with _default_share_lock:
+        if _default_share is None:
+            logger.debug("CurlShareCache: Creating process-wide share")
+            _default_share = CurlShareCache()
+        return _default_share
@@ -0,0 +1,85 @@
+import contextlib
+import time
+
+import pycurl
+
+TRANSFER_INFO = {
+    "namelookup_time": pycurl.NAMELOOKUP_TIME,
+    "connect_time": pycurl.CONNECT_TIME,
+    "appconnect_time": pycurl.APPCONNECT_TIME,
+    "starttransfer_time": pycurl.STARTTRANSFER_TIME,
+    "total_time": pycurl.TOTAL_TIME,
+    "size_download": pycurl.SIZE_DOWNLOAD_T,
+}
+
+
+class FetchStats:
+    """Timings of one sourcetable fetch.
+
+    Attributes
+    ----------
+    caster : (str, int) or None
+        Host and port of the caster.
+    url : str or None
+        URL the result is received from.
+    namelookup_time, connect_time, appconnect_time, starttransfer_time, total_time : float or None
+        Seconds from the start of the winning transfer to the end of name
+        resolution, TCP connect, TLS handshake, the first response byte and
+        the transfer, as reported by libcurl. None when no transfer was made,
+        e.g. for fresh responses of the response cache.
+    size_download : int or None
+        Bytes received.
+    parse_times : dict
+        Seconds spent in parsing phases of the fetch: `decode`, `parse`
+        (splitting lines and building rows, done in one pass), `distance`,
+        `trim` and `export`. With the fast distance mode trimming is a part
+        of `distance`. Phases which did not run are missing.
+    error : NtripbrowserError or None
+        Exception the fetch failed with.
+    """
+
+    def __init__(self, caster=None):
+        self.caster = caster
+        self.url = None
+        self.namelookup_time = None
+        self.connect_time = None
+        self.appconnect_time = None
+        self.starttransfer_time = None
+        self.total_time = None
+        self.size_download = None
+        self.parse_times = {}
+        self.error = None
+
+    def __repr__(self):
+        return f"FetchStats({self.as_dict()!r})"
+
+    @property
+    def parse_time(self):
+        return sum(self.parse_times.values())
+
+    def record_transfer(self, curl):
+        for name, info in TRANSFER_INFO.items():
+            setattr(self, name, curl.getinfo(info))
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """Add the time spent in the block to the `name` parsing phase."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.parse_times[name] = self.parse_times.get(name, 0) + time.perf_counter() - start
+
+    def as_dict(self):
+        return {
+            "caster": self.caster,
+            "url": self.url,
+            **{name: getattr(self, name) for name in TRANSFER_INFO},
+            "parse_times": dict(self.parse_times),
+            "error": self.error,
+        }
+
+
+def timed(stats, phase):
+    """Return `stats.phase(phase)`, or a context doing nothing without `stats`."""
+    return contextlib.nullcontext() if stats is None else stats.phase(phase)
@@ -0,0 +1,121 @@
+import logging
+
+from .constants import ENCODING_DETECTION_SAMPLE_SIZE, ENDSOURCETABLE
+
+logger = logging.getLogger(__name__)
+
+
+class SourcetableParser:
+    """Incremental sourcetable parser fed with raw chunks as they arrive.
+
+    Lines split between chunks are kept until completed, complete
+    STR/CAS/NET lines are collected as `(table, line)` pairs where
+    `table` is one of "str", "cas" or "net".
+
+    Attributes
+    ----------
+    records : [(str, str), ...]
+        Records parsed but not taken with `pop_records` yet.
+    found_records : bool
+        At least one record is parsed.
+    finished : bool
+        `ENDSOURCETABLE` is received.
+    encoding : str
+        Encoding of the lines. Lines are decoded as UTF-8 until one fails,
+        then `known_encoding` is tried, otherwise the encoding is detected
+        once on a bounded sample starting at the first non UTF-8 byte.
+        Records are held back until the sample is complete, the encoding
+        is not switched again afterwards.
+
+    Parameters
+    ----------
+    known_encoding : str or None
+        Encoding the sourcetable had last time.
+    """
+
+    _RECORD_PREFIXES = ((b"STR", "str"), (b"CAS", "cas"), (b"NET", "net"))
+
+    def __init__(self, known_encoding=None):
+        self.records = []
+        self.finished = False
+        self.found_records = False
+        self.encoding = "utf8"
+        self.known_encoding = known_encoding
+        self._tail = b""
+        self._settled = False
+        self._pending = []
+        self._sample = b""
+
+    def feed(self, chunk):
+        if self.finished:
+            return
+        lines = (self._tail + chunk).split(b"\n")
+        self._tail = lines.pop()
+        for line in lines:
+            self._parse_line(line)
+            if self.finished:
+                return
+
+    def close(self):
+        if self._tail:
+            self._parse_line(self._tail)
+            self._tail = b""
+        if self._pending:
+            self._detect_encoding()
+
+    def pop_records(self):
+        records, self.records = self.records, []
+        return records
+
+    def _parse_line(self, line):
+        line = line.rstrip(b"\r")
+        if line.strip() == ENDSOURCETABLE:
+            self.finished = True
+            if self._pending:
+                self._detect_encoding()
+            return
+        for prefix, table in self._RECORD_PREFIXES:
+            if line.startswith(prefix):
+                self._add_record(table, line)
+                self.found_records = True
+                return
+
+    def _add_record(self, table, line):
+        if self._pending:
+            self._hold_back(table, line)
+            return
+        try:
+            self.records.append((table, line.decode(self.encoding)))
+        except UnicodeDecodeError as error:
+            if self._settled:
+                self.records.append((table, line.decode(self.encoding, errors="replace")))
+            elif not self._switch_to_known_encoding(table, line):
+                self._hold_back(table, line, error.start)
+
+    def _switch_to_known_encoding(self, table, line):
+        if self.known_encoding is None:
+            return False
+        try:
+            self.records.append((table, line.decode(self.known_encoding)))
+        except UnicodeDecodeError:
+            return False
+        self.encoding = self.known_encoding
+        self._settled = True
+        return True
+
+    def _hold_back(self, table, line, first_invalid_byte=0):
+        self._pending.append((table, line))
+        self._sample += line[first_invalid_byte:] + b"\n"
+        if len(self._sample) >= ENCODING_DETECTION_SAMPLE_SIZE:
+            self._detect_encoding()
+
+    def _detect_encoding(self):
+        import cchardet
+
+        self.encoding = cchardet.detect(self._sample[:ENCODING_DETECTION_SAMPLE_SIZE])["encoding"] or "utf8"
+        self._settled = True
+        logger.debug("SourcetableParser: Detected %s encoding", self.encoding)
+        for table, line in self._pending:
+            self.records.append((table, line.decode(self.encoding, errors="replace")))
+        self._pending = []
+        self._sample = b""
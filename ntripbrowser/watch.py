@@ -0,0 +1,89 @@
+"""Changes between consecutive sourcetables of a caster.
+
+Rows are identified by `Mountpoint` in STR, by `Host` and `Port` in CAS
+and by `ID` in NET tables (`WATCH_KEY_FIELDS`). `Distance` is not
+compared, only fields received from the caster are.
+"""
+
+import random
+import time
+from collections import namedtuple
+
+from .constants import (
+    NTRIP_TABLE_HEADERS,
+    WATCH_EVENT_ADDED,
+    WATCH_EVENT_MODIFIED,
+    WATCH_EVENT_REMOVED,
+    WATCH_KEY_FIELDS,
+)
+
+WatchEvent = namedtuple("WatchEvent", ["kind", "table", "key", "row", "previous"])
+WatchEvent.__doc__ = """Change of one row.
+
+`kind` is "added", "removed" or "modified", `table` is one of "str",
+"cas" or "net". `key` is the `Mountpoint` or `ID` value, or a
+`(Host, Port)` tuple for CAS rows. `row` is the current row (the last
+seen one for removed rows), `previous` is the row before modification
+and None for the other events.
+"""
+
+
+def row_key(table, row):
+    key = tuple(row.get(field) for field in WATCH_KEY_FIELDS[table])
+    return key[0] if len(key) == 1 else key
+
+
+def take_snapshot(ntrip_dictionary):
+    """Return `{table: {key: row}}` of a `get_mountpoints` result, the last of rows with equal keys is kept."""
+    return {
+        table: {row_key(table, row): row for row in ntrip_dictionary.get(table, ())} for table in NTRIP_TABLE_HEADERS
+    }
+
+
+def diff_snapshots(previous, current):
+    """Yield `WatchEvent`s turning the `previous` snapshot into the `current` one."""
+    for table in NTRIP_TABLE_HEADERS:
+        old_rows, new_rows = previous.get(table, {}), current.get(table, {})
+        for key, row in new_rows.items():
+            old_row = old_rows.get(key)
+            if old_row is None:
+                yield WatchEvent(WATCH_EVENT_ADDED, table, key, row, None)
+            elif _modified(old_row, row):
+                yield WatchEvent(WATCH_EVENT_MODIFIED, table, key, row, old_row)
+        for key, row in old_rows.items():
+            if key not in new_rows:
+                yield WatchEvent(WATCH_EVENT_REMOVED, table, key, row, None)
+
+
+def changed_fields(previous, row):
+    """Return names of the fields which differ between two versions of a row."""
+    return [
+        field
+        for field in dict.fromkeys([*previous, *row])
+        if field != "Distance" and previous.get(field) != row.get(field)
+    ]
+
+
+def _modified(previous, row):
+    # rows are mostly unchanged, so they are compared as a whole first
+    return previous != row and bool(changed_fields(previous, row))
+
+
+def poll_times(interval, jitter):
+    """Yield monotonic times of the polls, `interval` seconds apart with up to `jitter` of it random offset.
+
+    The offsets do not accumulate, so polls do not drift from the schedule.
+    The next time is taken when the previous poll is over. If the poll has
+    stalled past it, the missed polls are skipped and the schedule starts
+    over, so that the next poll is `interval` seconds away instead of a
+    burst of late polls.
+    """
+    start = time.monotonic()
+    tick = 0
+    while True:
+        offset = random.uniform(-jitter, jitter) * interval if tick else 0
+        yield start + tick * interval + offset
+        tick += 1
+        now = time.monotonic()
+        if start + tick * interval < now:
+            start, tick = now, 1
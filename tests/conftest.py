@@ -0,0 +1,78 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class LocalCaster(ThreadingHTTPServer):
+    """Plain HTTP caster on localhost, answers every path with `sourcetable`.
+
+    `raw` switches the answers to NTRIP 1.0 style responses without
+    the HTTP status line and headers. HTTP responses carry `etag` and
+    honor `If-None-Match`, their connections are kept alive.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, sourcetable=b'', raw=True, etag=None):
+        super().__init__(('127.0.0.1', 0), LocalCasterHandler)
+        self.sourcetable = sourcetable
+        self.raw = raw
+        self.etag = etag
+        self.requests = []
+        self.connections = 0
+
+    @property
+    def host(self):
+        return self.server_address[0]
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+
+class LocalCasterHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # responses are sent in one piece, otherwise delayed ACKs stall reused connections
+    wbufsize = -1
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        if self.server.raw:
+            self.wfile.write(self.server.sourcetable)
+            self.close_connection = True
+            return
+        if self.server.etag and self.headers.get('If-None-Match') == self.server.etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        if self.server.etag:
+            self.send_header('ETag', self.server.etag)
+        self.send_header('Content-Type', 'text/plain')
+        self.send_header('Content-Length', str(len(self.server.sourcetable)))
+        self.end_headers()
+        self.wfile.write(self.server.sourcetable)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_caster():
+    casters = []
+
+    def start(sourcetable, raw=True, etag=None):
+        caster = LocalCaster(sourcetable, raw, etag)
+        threading.Thread(target=caster.serve_forever, daemon=True).start()
+        casters.append(caster)
+        return caster
+
+    yield start
+    for caster in casters:
+        caster.shutdown()
+        caster.server_close()
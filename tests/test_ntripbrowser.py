@@ -1,8 +1,27 @@
+import asyncio
+import concurrent.futures
+import functools
+import cchardet
+import json
+import pickle
+import pycurl
+import ssl
+import subprocess
+import sys
+import threading
 import pytest
 from collections import namedtuple
 
-from ntripbrowser import (NtripBrowser, UnableToConnect, ExceededTimeoutError,
-                          NoDataReceivedFromCaster)
+from ntripbrowser import (NtripBrowser, AsyncNtripBrowser, EndpointCache, UnableToConnect, ExceededTimeoutError,
+                          NoDataReceivedFromCaster, ResponseCache, MemoryCacheBackend, FileCacheBackend, ParseMemo,
+                          MountpointIndex, StrRecord, STR_HEADERS, CurlPool, CurlShareCache,
+                          default_share, CasterScheduler, CircuitOpenError, ResponseLimits, ResponseTooLargeError)
+from ntripbrowser import async_ntripbrowser, browser, distance, ntripbrowser, render
+from ntripbrowser.buffers import ResponseBuffer
+from ntripbrowser.cache import CachedResponse
+from ntripbrowser.output import format_event
+from ntripbrowser.streaming import SourcetableParser
+from ntripbrowser.watch import diff_snapshots, poll_times, take_snapshot
 import testing_content
 
 
@@ -328,3 +347,847 @@ def test_caster_no_distance_processed():
         'net': [],
         'str': [near_parsed],
     }
+
+
+def test_get_mountpoints_many(local_caster):
+    first = local_caster(testing_content.VALID_STR_NTRIP)
+    second = local_caster(testing_content.VALID_CAS_NTRIP)
+    unreachable = ('127.0.0.1', 1)
+    browser = NtripBrowser('test', timeout=2)
+    results = dict(browser.get_mountpoints_many(
+        [(first.host, first.port), (second.host, second.port), unreachable], max_connections=3))
+
+    assert results[(first.host, first.port)]['str'][0]['Mountpoint'] == 'Str3'
+    assert results[(second.host, second.port)]['cas'][0]['Host'] == 'example'
+    assert isinstance(results[unreachable], UnableToConnect)
+
+
+def test_async_get_mountpoints(local_caster):
+    for raw in (True, False):
+        caster = local_caster(testing_content.VALID_NTRIP, raw=raw)
+        browser = AsyncNtripBrowser(caster.host, caster.port, timeout=2)
+        result = asyncio.run(browser.get_mountpoints())
+        assert result['str'][0]['Mountpoint'] == 'Str3'
+        assert result['cas'][0]['Host'] == 'example'
+
+
+def test_async_browser_options(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    parse_threads = []
+
+    class Browser(AsyncNtripBrowser):
+        def _process_raw_data(self, raw_data, caster=None, stats=None):
+            parse_threads.append(threading.current_thread())
+            return super()._process_raw_data(raw_data, caster, stats)
+
+    reported = []
+    browser = Browser(caster.host, caster.port, timeout=2, endpoint_cache=EndpointCache(), parse_threshold=0,
+                      scheduler=CasterScheduler(), stats_hook=reported.append)
+    assert asyncio.run(browser.get_mountpoints())['str'][0]['Mountpoint'] == 'Str3'
+    caster.requests.clear()
+    # only the remembered url is requested
+    assert asyncio.run(browser.get_mountpoints())['str'][0]['Mountpoint'] == 'Str3'
+    assert len(caster.requests) == 1
+    assert threading.main_thread() not in parse_threads
+    assert reported[-1].url == browser.winning_url and reported[-1].size_download == len(testing_content.VALID_NTRIP)
+    assert browser.scheduler.failures(caster.host, caster.port) == 0
+
+    with pytest.raises(ResponseTooLargeError):
+        asyncio.run(AsyncNtripBrowser(caster.host, caster.port, timeout=2,
+                                      response_limits=ResponseLimits(max_size=100)).get_mountpoints())
+    with pytest.raises(TypeError):
+        AsyncNtripBrowser(caster.host, curl_pool=CurlPool())
+    with pytest.raises(TypeError):
+        browser.iter_mountpoints()
+
+
+def test_async_browser_creates_ssl_context_once(local_caster, monkeypatch):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    contexts = []
+    monkeypatch.setattr(ssl, 'create_default_context', lambda: contexts.append(ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)) or contexts[-1])
+    async_ntripbrowser._ssl_context.cache_clear()
+    browser = AsyncNtripBrowser(caster.host, caster.port, timeout=2)
+    for _ in range(3):
+        assert asyncio.run(browser.get_mountpoints())['str'][0]['Mountpoint'] == 'Str3'
+    async_ntripbrowser._ssl_context.cache_clear()
+    assert len(contexts) == 1
+
+
+def test_async_unreachable_caster():
+    browser = AsyncNtripBrowser('127.0.0.1', 1, timeout=2)
+    with pytest.raises(UnableToConnect):
+        asyncio.run(browser.get_mountpoints())
+
+
+def test_staggered_requests_stop_at_first_winner(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, stagger_delay=1)
+    assert browser.get_mountpoints()['str'][0]['Mountpoint'] == 'Str3'
+    assert browser.winning_url == 'http://{}:{}'.format(caster.host, caster.port)
+    assert [path for path, _ in caster.requests] == ['/']
+
+
+def test_winning_url_is_requested_first(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, stagger_delay=1)
+    browser.winning_url = 'http://{}:{}/sourcetable.txt'.format(caster.host, caster.port)
+    browser.get_mountpoints()
+    assert [path for path, _ in caster.requests] == ['/sourcetable.txt']
+
+
+def test_endpoint_cache_persistence(tmp_path):
+    path = str(tmp_path / 'endpoints.json')
+    cache = EndpointCache(ttl=60, path=path)
+    cache.set('example', 2101, 'http://example:2101/sourcetable.txt')
+    assert EndpointCache(ttl=60, path=path).get('example', 2101) == 'http://example:2101/sourcetable.txt'
+    assert EndpointCache(ttl=-1, path=path).get('example', 2101) is None
+    cache.forget('example', 2101)
+    assert EndpointCache(ttl=60, path=path).get('example', 2101) is None
+
+
+def test_known_endpoint_is_requested_alone(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP)
+    known_url = 'http://{}:{}/sourcetable.txt'.format(caster.host, caster.port)
+    cache = EndpointCache()
+    cache.set(caster.host, caster.port, known_url)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, endpoint_cache=cache)
+    browser.get_mountpoints()
+    assert [path for path, _ in caster.requests] == ['/sourcetable.txt']
+
+    results = dict(browser.get_mountpoints_many([(caster.host, caster.port)]))
+    assert results[(caster.host, caster.port)]['str'][0]['Mountpoint'] == 'Str3'
+    assert len(caster.requests) == 2
+
+
+def test_failed_known_endpoint_falls_back_to_all_urls(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP)
+    cache = EndpointCache()
+    cache.set(caster.host, caster.port, 'https://{}:{}'.format(caster.host, caster.port))
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, endpoint_cache=cache)
+    assert browser.get_mountpoints()['str'][0]['Mountpoint'] == 'Str3'
+    assert cache.get(caster.host, caster.port) == browser.winning_url
+    assert browser.winning_url.startswith('http://')
+
+
+def test_fresh_cached_response_skips_request(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, stagger_delay=1,
+                           response_cache=ResponseCache(max_age=60))
+    first = browser.get_mountpoints()
+    assert browser.get_mountpoints() == first
+    assert len(caster.requests) == 1
+
+
+def test_stale_cached_response_is_revalidated(local_caster, tmp_path):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False, etag='"v1"')
+    cache = ResponseCache(FileCacheBackend(str(tmp_path)), max_age=0)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, stagger_delay=1, response_cache=cache)
+    first = browser.get_mountpoints()
+    assert browser.get_mountpoints() == first
+    assert [headers.get('If-None-Match') for _, headers in caster.requests] == [None, '"v1"']
+
+
+def test_cached_responses_are_not_parsed_again(local_caster, monkeypatch, tmp_path):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False, etag='"v1"')
+    parses = []
+    parse_raw_data = NtripBrowser._parse_raw_data
+    monkeypatch.setattr(NtripBrowser, '_parse_raw_data',
+                        lambda self, *args, **kwargs: parses.append(args) or parse_raw_data(self, *args, **kwargs))
+    cache = ResponseCache(FileCacheBackend(str(tmp_path)), max_age=0)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, response_cache=cache, endpoint_cache=EndpointCache())
+    first = browser.get_mountpoints()
+    assert browser.get_mountpoints() is first
+    assert caster.requests[-1][1].get('If-None-Match') == '"v1"'
+    assert len(parses) == 1
+
+    browser.coordinates = (1, 2)
+    assert browser.get_mountpoints() is not first
+    cache.max_age = 60
+    browser.coordinates = None
+    assert browser.get_mountpoints() is first
+    assert len(parses) == 2
+
+
+@pytest.mark.parametrize('meta', ['{"etag": null}', '["etag"]', '{"etag": '])
+def test_file_cache_backend_ignores_corrupt_entries(tmp_path, meta):
+    backend = FileCacheBackend(str(tmp_path))
+    backend.set('url', CachedResponse('url', b'12345', etag='"v1"'))
+    with open(backend._path('url', '.json'), 'w') as meta_file:
+        meta_file.write(meta)
+    assert backend.get('url') is None
+
+
+def test_file_cache_backend_removes_unfinished_files(tmp_path, monkeypatch):
+    backend = FileCacheBackend(str(tmp_path))
+
+    def replace(source, destination):
+        raise OSError('disk is full')
+
+    monkeypatch.setattr('ntripbrowser.cache.os.replace', replace)
+    backend.set('url', CachedResponse('url', b'12345'))
+    assert backend.get('url') is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_memory_cache_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_size=10)
+    backend.set('first', CachedResponse('first', b'12345'))
+    backend.set('second', CachedResponse('second', b'12345'))
+    backend.get('first')
+    backend.set('third', CachedResponse('third', b'12345'))
+    assert backend.get('second') is None
+    assert backend.get('first') is not None
+
+
+def test_memoized_result_is_reused():
+    memo = ParseMemo()
+    browser = NtripBrowser('test', 1234, coordinates=(1.0, 2.0), maxdist=2500, memo=memo)
+    first = browser._process_raw_data(testing_content.VALID_NTRIP_TRIM_DISTANCE)
+    assert browser._process_raw_data(testing_content.VALID_NTRIP_TRIM_DISTANCE) is first
+
+    browser.coordinates = (10.0, 20.0)
+    moved = browser._process_raw_data(testing_content.VALID_NTRIP_TRIM_DISTANCE)
+    assert [row['Mountpoint'] for row in moved['str']] == ['far', 'near']
+    assert [row['Mountpoint'] for row in first['str']] == ['near', 'far']
+    assert moved == NtripBrowser('test', 1234, coordinates=(10.0, 20.0), maxdist=2500)._process_raw_data(
+        testing_content.VALID_NTRIP_TRIM_DISTANCE)
+
+
+def test_sourcetable_parser_joins_chunks():
+    parser = SourcetableParser()
+    for chunk in (b'SOURCETABLE 200 OK\r\nST', b'R;near;Rehakka;RTCM 3.3\r', b'\nNET;Str1;Str2\r\nENDSOURCETABLE\r\n',
+                  b'STR;after;end\r\n'):
+        parser.feed(chunk)
+    parser.close()
+    assert parser.finished
+    assert parser.pop_records() == [('str', 'STR;near;Rehakka;RTCM 3.3'), ('net', 'NET;Str1;Str2')]
+
+
+CP1251_SOURCETABLE = '\r\n'.join(
+    ['SOURCETABLE 200 OK', 'STR;Plain;Plain;RTCM 3.2;;;;;;55.75;37.62']
+    + [f'STR;Moskva{index};Станция Москва {index};RTCM 3.2;;;;;;55.75;37.62' for index in range(20)]
+    + ['ENDSOURCETABLE', '']).encode('cp1251')
+
+
+def test_sourcetable_parser_detects_encoding_once(monkeypatch):
+    parser = SourcetableParser()
+    for start in range(0, len(CP1251_SOURCETABLE), 100):
+        parser.feed(CP1251_SOURCETABLE[start:start + 100])
+    assert parser.finished and parser.encoding == 'WINDOWS-1251'
+    lines = [line for _, line in parser.pop_records()]
+    assert lines == CP1251_SOURCETABLE.decode('cp1251').split('\r\n')[1:-2]
+
+    monkeypatch.setattr(cchardet, 'detect', None)
+    parser = SourcetableParser(known_encoding='cp1251')
+    parser.feed(CP1251_SOURCETABLE)
+    assert [line for _, line in parser.pop_records()] == lines
+
+
+def test_iter_mountpoints_remembers_encoding(local_caster):
+    caster = local_caster(CP1251_SOURCETABLE)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2)
+    rows = [row for _, row in browser.iter_mountpoints()]
+    assert rows[1]['ID'] == 'Станция Москва 0'
+    assert browser._caster_encodings == {(caster.host, caster.port): 'WINDOWS-1251'}
+    assert [row for _, row in browser.iter_mountpoints()] == rows
+
+
+def test_iter_mountpoints(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP_TRIM_DISTANCE)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, coordinates=(1.0, 2.0), maxdist=50)
+    rows = list(browser.iter_mountpoints())
+    assert rows == [('str', browser._process_raw_data(testing_content.VALID_NTRIP_TRIM_DISTANCE)['str'][0])]
+    assert browser.winning_url is not None
+
+
+@pytest.mark.parametrize('distance_mode', ['geodesic', 'fast'])
+@pytest.mark.parametrize('maxdist', [50, 2500, None])
+def test_iter_mountpoints_locates_rows_as_get_mountpoints(local_caster, distance_mode, maxdist):
+    caster = local_caster(testing_content.VALID_NTRIP_TRIM_DISTANCE)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, coordinates=(1.0, 2.0), maxdist=maxdist,
+                           distance_mode=distance_mode, row_format='record')
+    rows = list(browser.iter_mountpoints())
+    expected = browser._process_raw_data(testing_content.VALID_NTRIP_TRIM_DISTANCE)
+    for table, expected_rows in expected.items():
+        table_rows = sorted((dict(row) for row_table, row in rows if row_table == table), key=repr)
+        expected_rows = sorted((dict(row) for row in expected_rows), key=repr)
+        assert len(table_rows) == len(expected_rows)
+        for row, expected_row in zip(table_rows, expected_rows):
+            assert row == pytest.approx(expected_row)
+
+
+@pytest.mark.parametrize('row_format', ['numpy', 'arrow'])
+def test_iter_mountpoints_rejects_columnar_row_formats(row_format):
+    with pytest.raises(ValueError):
+        NtripBrowser('test', 1234, row_format=row_format).iter_mountpoints()
+
+
+def test_iter_mountpoints_failure_matches_get_mountpoints(local_caster):
+    caster = local_caster(b'<Some invalid NTRIP data>')
+    browser = NtripBrowser(caster.host, caster.port, timeout=2)
+    with pytest.raises(UnableToConnect):
+        browser.get_mountpoints()
+    with pytest.raises(UnableToConnect):
+        list(browser.iter_mountpoints())
+
+
+def test_fast_distance_mode(monkeypatch):
+    geodesic_browser = NtripBrowser('test', 1234, coordinates=(1.0, 2.0), maxdist=2500)
+    fast_browser = NtripBrowser('test', 1234, coordinates=('1.0', '2.0'), maxdist=2500, distance_mode='fast')
+    expected = geodesic_browser._process_raw_data(testing_content.VALID_NTRIP_TRIM_DISTANCE)['str']
+    result = fast_browser._process_raw_data(testing_content.VALID_NTRIP_TRIM_DISTANCE)['str']
+    assert [row['Mountpoint'] for row in result] == ['near', 'far']
+    for row, expected_row in zip(result, expected):
+        assert row['Distance'] == pytest.approx(expected_row['Distance'], rel=1e-4)
+
+    monkeypatch.setattr(distance, 'numpy', None)
+    assert fast_browser._process_raw_data(testing_content.VALID_NTRIP_TRIM_DISTANCE)['str'] == result
+
+    fast_browser.maxdist = 50
+    result = fast_browser._process_raw_data(testing_content.VALID_NTRIP_NO_BASE_POINT)['str']
+    assert [row['Mountpoint'] for row in result] == ['near']
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_fast_distances_near_the_antipode(monkeypatch, use_numpy):
+    from geopy.distance import geodesic
+
+    if not use_numpy:
+        monkeypatch.setattr(distance, 'numpy', None)
+    point = (40.0, 20.0)
+    latitudes, longitudes = [-40.0, -40.5, -38.0, -30.0], [-160.0, -159.0, -157.0, -150.0]
+    result = distance.fast_distances(latitudes, longitudes, point)
+    for latitude, longitude, fast in zip(latitudes, longitudes, result):
+        assert fast == pytest.approx(geodesic((latitude, longitude), point).kilometers, rel=1e-4)
+
+
+@pytest.mark.parametrize('use_numpy', [True, False])
+def test_bounding_box_prefilter(monkeypatch, use_numpy):
+    if not use_numpy:
+        monkeypatch.setattr(distance, 'numpy', None)
+    antimeridian = (0.0, 179.9)
+    box = distance.bounding_box(antimeridian, 50)
+    assert distance.inside_bounding_box([0.1, 0.0, 0.0, 5.0], [-179.9, 170.0, 179.6, 179.9], antimeridian, box) == \
+        [True, False, True, False]
+    assert distance.bounding_box((89.9, 0.0), 50)[2] is None
+    assert distance.bounding_box((0.0, 0.0), 20000) == (-90, 90, None)
+
+
+def test_mountpoint_index():
+    stations = NtripBrowser('test', 1234)._process_raw_data(testing_content.VALID_NTRIP_NO_BASE_POINT)['str'] + \
+        NtripBrowser('test', 1234)._process_raw_data(testing_content.VALID_NTRIP_TRIM_DISTANCE)['str'][1:]
+    index = MountpointIndex(stations)
+    assert len(index) == 2
+    expected = NtripBrowser('test', 1234, coordinates=(1.0, 2.0), maxdist=2500)._process_raw_data(
+        testing_content.VALID_NTRIP_TRIM_DISTANCE)['str']
+    assert index.nearest(1.0, 2.0, k=5) == expected
+    assert index.nearest(1.0, 2.0) == expected[:1]
+    assert index.within(1.0, 2.0, 50) == expected[:1]
+    assert stations[0]['Distance'] is None
+
+
+@pytest.mark.parametrize('raw_data', [testing_content.VALID_NTRIP, testing_content.VALID_NTRIP_TRIM_DISTANCE])
+def test_record_rows_match_dictionaries(raw_data):
+    expected = NtripBrowser('test', 1234, coordinates=(1.0, 2.0))._process_raw_data(raw_data)
+    browser = NtripBrowser('test', 1234, coordinates=(1.0, 2.0), row_format='record', memo=ParseMemo())
+    result = browser._process_raw_data(raw_data)
+    assert result == expected
+    assert all(isinstance(row, StrRecord) for row in result['str'])
+    assert [dict(row) for row in result['str']] == expected['str']
+    assert pickle.loads(pickle.dumps(result)) == expected
+
+
+def test_records_change_as_dictionaries():
+    record = StrRecord(['Str3', 'Str4'])
+    expected = {'Mountpoint': 'Str3', 'ID': 'Str4'}
+    changes = [('Country', 'FIN'), ('Note', 'spare'), ('Distance', 1.5), ('Format', 'RTCM 3')]
+    for key, value in changes:
+        record[key] = expected[key] = value
+    assert record == expected and len(record) == 6
+    assert list(record) == ['Mountpoint', 'ID', 'Format', 'Country', 'Distance', 'Note']
+    with pytest.raises(KeyError):
+        record['Carrier']
+    copied = pickle.loads(pickle.dumps(record.copy()))
+    for key in ('ID', 'Note', 'Country'):
+        del record[key], expected[key]
+    assert record == expected and len(record) == 3
+    with pytest.raises(KeyError):
+        del record['ID']
+    assert copied['Note'] == 'spare' and copied['Country'] == 'FIN' and 'Carrier' not in copied
+    copied.clear()
+    assert copied == {}
+
+
+def test_numpy_row_format():
+    pytest.importorskip('numpy')
+    expected = NtripBrowser('test', 1234, coordinates=(1.0, 2.0))._process_raw_data(testing_content.VALID_NTRIP)
+    result = NtripBrowser('test', 1234, coordinates=(1.0, 2.0), row_format='numpy')._process_raw_data(
+        testing_content.VALID_NTRIP)
+    assert result['cas'].dtype['Port'].kind == 'i' and result['cas'].dtype['Host'].kind == 'O'
+    assert result['cas']['Host'].tolist() == [row['Host'] for row in expected['cas']]
+    assert result['cas']['Distance'].tolist() == [row['Distance'] for row in expected['cas']]
+    assert result['net']['Fee'].tolist() == [{'N': 0, 'Y': 1}.get(row['Fee'], -1) for row in expected['net']]
+    assert result['str']['Bitrate'].tolist() == [-1]
+    assert result['str']['Carrier'].tolist() == [-1] and result['str']['Generator'].tolist() == [None]
+
+
+def test_arrow_row_format():
+    pytest.importorskip('pyarrow')
+    result = NtripBrowser('test', 1234, row_format='arrow')._process_raw_data(testing_content.VALID_NTRIP)
+    assert result['str'].column_names == list(STR_HEADERS)
+    assert result['str'].column('Distance').null_count == len(result['str'])
+
+
+def test_single_pass_tokenizer_skips_other_lines():
+    raw_data = (b'SOURCETABLE 200 OK\r\nServer: NTRIP STR;CAS;NET\r\n\r\n'
+                b'CAS;example;2101;NtripCaster\r\nSTR;Str3;Str4;RTCM 3.2\r\nSTR\r\nENDSOURCETABLE\r\n')
+    result = NtripBrowser('test', 1234)._parse_raw_data(raw_data)
+    assert result == {
+        'str': [{'Mountpoint': 'Str3', 'ID': 'Str4', 'Format': 'RTCM 3.2'}, {}],
+        'cas': [{'Host': 'example', 'Port': '2101', 'ID': 'NtripCaster'}],
+        'net': [],
+    }
+
+
+def test_single_pass_tokenizer_splits_lines_as_splitlines():
+    data = 'STR;a;b\rCAS;host;2101\u2028NET;net\x85STRX;c\nSTR\r\n' + ';'.join(['STR'] + list(STR_HEADERS) + ['x'])
+    result = NtripBrowser('test', 1234)._form_ntrip_entries(data)
+    assert result == {
+        'str': [{'Mountpoint': 'a', 'ID': 'b'}, {'Mountpoint': 'c'}, {},
+                {header: header for header in STR_HEADERS[:-1]}],
+        'cas': [{'Host': 'host', 'Port': '2101'}],
+        'net': [{'ID': 'net'}],
+    }
+    assert list(ntripbrowser._split_lines(data, chunk_size=3)) == data.splitlines()
+    # the table headers are importable from the module as before
+    assert ntripbrowser.STR_HEADERS is STR_HEADERS
+
+
+def test_encoding_is_detected_once_per_caster(monkeypatch):
+    detected = []
+    detect = cchardet.detect
+    monkeypatch.setattr(cchardet, 'detect', lambda data: detected.append(data) or detect(data))
+    browser = NtripBrowser('test', 1234)
+    assert browser._parse_raw_data(testing_content.VALID_NTRIP)['str'][0]['Mountpoint'] == 'Str3'
+    assert not detected
+
+    raw_data = 'SOURCETABLE 200 OK\nSTR;Moskva;Станция Москва Северная;RTCM 3.2\nENDSOURCETABLE'.encode('cp1251')
+    for _ in range(2):
+        assert browser._parse_raw_data(raw_data)['str'][0]['ID'] == 'Станция Москва Северная'
+    assert len(detected) == 1
+    assert detected[0].startswith('Станция'.encode('cp1251'))
+
+
+def test_cli_import_is_lazy():
+    code = 'import sys, ntripbrowser.browser; print(" ".join(sorted(sys.modules)))'
+    imported = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True, check=True).stdout.split()
+    assert not {'asyncio', 'cchardet', 'geopy', 'numpy', 'pager'} & set(imported)
+
+
+@pytest.mark.parametrize('output_format, expected', [
+    ('jsonl', '{"Mountpoint": "Str3", "Format": "B"}\n'),
+    ('json', '[\n{"Mountpoint": "Str3", "Format": "B"}\n]\n'),
+    ('csv', 'Mountpoint,Format\nStr3,B\n'),
+])
+def test_cli_streaming_formats(local_caster, monkeypatch, capsys, output_format, expected):
+    caster = local_caster(testing_content.VALID_NTRIP)
+    monkeypatch.setattr(sys, 'argv', ['ntripbrowser', caster.host, '-p', str(caster.port), '-f', output_format,
+                                      '--tables', 'str', '--columns', 'Mountpoint,Format'])
+    assert browser.main() == 0
+    assert capsys.readouterr().out == expected
+
+
+def test_cli_jsonl_keeps_all_fields(local_caster, monkeypatch, capsys):
+    caster = local_caster(testing_content.VALID_NTRIP)
+    monkeypatch.setattr(sys, 'argv', ['ntripbrowser', caster.host, '-p', str(caster.port), '-f', 'jsonl'])
+    assert browser.main() == 0
+    rows = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [row['Type'] for row in rows] == ['CAS', 'STR', 'NET']
+    assert rows[0]['Host'] == 'example' and rows[0]['Distance'] is None
+
+
+def test_cli_reports_too_large_responses(local_caster, monkeypatch, capsys):
+    caster = local_caster(testing_content.VALID_NTRIP)
+    monkeypatch.setattr(browser, 'NtripBrowser',
+                        functools.partial(NtripBrowser, response_limits=ResponseLimits(max_size=100)))
+    monkeypatch.setattr(sys, 'argv', ['ntripbrowser', caster.host, '-p', str(caster.port), '-f', 'jsonl'])
+    assert browser.main() == 1
+    assert capsys.readouterr().err == 'NTRIP caster response is too large\n'
+    monkeypatch.setattr(sys, 'argv', ['ntripbrowser', caster.host, '-p', str(caster.port)])
+    browser.main()
+    assert capsys.readouterr().out == 'NTRIP caster response is too large\n'
+
+
+def test_render_table_fits_and_truncates():
+    rows = [{'Mountpoint': 'near', 'Country': 'FIN', 'Distance': 24.85524549},
+            {'Mountpoint': 'a_very_long_mountpoint_name', 'Distance': None}]
+    lines = list(render.render_table(rows, ('Mountpoint', 'Country', 'Distance'), 40))
+    assert lines == [
+        'Mountpoint          | Country | Distance',
+        '-' * 40,
+        'near                | FIN     | 24.855',
+        'a_very_long_mountp~ |         |',
+    ]
+    assert render.fit_widths([4, 30, 50], 40) == [4, 18, 18]
+
+    chunked = list(render.render_table(iter(rows), ('Mountpoint',), 40, chunk_size=1))
+    assert chunked == ['Mountpoint', '-' * 10, 'near', 'Mountpoint', '-' * 27, 'a_very_long_mountpoint_name']
+
+
+def test_display_ntrip_table(monkeypatch, capsys):
+    monkeypatch.setattr(browser, 'get_screen_width', lambda: 60)
+    ntrip_table = NtripBrowser('test', 1234)._process_raw_data(testing_content.VALID_NTRIP)
+    browser.display_ntrip_table(ntrip_table, tables=['cas', 'net'], columns=['ID', 'Operator'])
+    assert capsys.readouterr().out == (
+        '=========================CAS TABLE==========================\n'
+        'ID          | Operator\n----------------------\nNtripCaster | None\n'
+        '\n\n\n\n'
+        '=========================NET TABLE==========================\n'
+        'ID   | Operator\n---------------\nStr1 | Str2\n'
+    )
+
+
+def test_curl_pool_reuses_connections(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    pool = CurlPool(max_size=2)
+    # only the HTTP url is requested, connections of aborted transfers are counted with a delay
+    endpoint_cache = EndpointCache()
+    endpoint_cache.set(caster.host, caster.port, f'http://{caster.host}:{caster.port}')
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, curl_pool=pool, endpoint_cache=endpoint_cache)
+    result = browser.get_mountpoints()
+    connections = caster.connections
+    assert len(pool) == 1
+
+    assert browser.get_mountpoints() == result
+    assert browser.get_mountpoints() == result
+    assert caster.connections == connections
+    pool.close()
+
+
+def test_curl_pool_keeps_connections_per_thread(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    pool = CurlPool()
+    endpoint_cache = EndpointCache()
+    endpoint_cache.set(caster.host, caster.port, f'http://{caster.host}:{caster.port}')
+    NtripBrowser(caster.host, caster.port, timeout=2, curl_pool=pool, endpoint_cache=endpoint_cache).get_mountpoints()
+    shares = [pool.share]
+
+    def fetch():
+        browser = NtripBrowser(caster.host, caster.port, timeout=2, curl_pool=pool, endpoint_cache=endpoint_cache)
+        for _ in range(2):
+            browser.get_mountpoints()
+        shares.append(pool.share)
+
+    connections = caster.connections
+    thread = threading.Thread(target=fetch)
+    thread.start()
+    thread.join()
+    assert shares[0] is not shares[1] and shares[0] is pool.share
+    # the thread opens its own connection once and reuses it
+    assert caster.connections == connections + 1
+    pool.close()
+
+
+def test_curl_pool_closes_handles_of_ended_threads(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    pool = CurlPool()
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, curl_pool=pool)
+    thread = threading.Thread(target=browser.get_mountpoints)
+    thread.start()
+    thread.join()
+    assert len(pool) > 0 and thread.ident in pool._shares
+    pool.release(pool.acquire())
+    assert len(pool) == 1 and list(pool._shares) == [threading.get_ident()]
+    pool.close()
+
+
+def test_curl_share_is_used_by_many_browsers(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    share = CurlShareCache(connections=True)
+    endpoint_cache = EndpointCache()
+    endpoint_cache.set(caster.host, caster.port, f'http://{caster.host}:{caster.port}')
+    first = NtripBrowser(caster.host, caster.port, timeout=2, curl_share=share, endpoint_cache=endpoint_cache)
+    result = first.get_mountpoints()
+    connections = caster.connections
+    share.reset_stats()
+
+    second = NtripBrowser(caster.host, caster.port, timeout=2, curl_share=share, endpoint_cache=endpoint_cache)
+    assert second.get_mountpoints() == result
+    assert caster.connections == connections
+    assert share.stats == {'transfers': 1, 'connections_reused': 1, 'connections_created': 0,
+                           'estimated_dns_hits': 1, 'estimated_dns_misses': 0}
+    share.close()
+
+
+def test_curl_share_is_used_by_many_threads(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    share = CurlShareCache()
+    results = []
+
+    def fetch():
+        for _ in range(3):
+            results.append(NtripBrowser(caster.host, caster.port, timeout=2, curl_share=share).get_mountpoints())
+
+    threads = [threading.Thread(target=fetch) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 6 and all(result == results[0] for result in results)
+    assert share.stats['transfers'] >= 6
+    share.close()
+
+    connection_share = CurlShareCache(connections=True)
+    errors = []
+
+    def attach():
+        try:
+            connection_share.attach(pycurl.Curl())
+        except RuntimeError as error:
+            errors.append(error)
+
+    thread = threading.Thread(target=attach)
+    thread.start()
+    thread.join()
+    assert errors
+    connection_share.close()
+
+
+def test_default_share_is_process_wide():
+    assert default_share() is default_share()
+    assert CurlPool(share=default_share()).share is default_share()
+
+
+def test_watch_yields_changes_only(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    watcher = NtripBrowser(caster.host, caster.port, timeout=2).watch(0.01, jitter=0)
+    first_poll = [next(watcher) for _ in range(3)]
+    assert sorted((event.kind, event.table, event.key) for event in first_poll) == [
+        ('added', 'cas', ('example', '2101')), ('added', 'net', 'Str1'), ('added', 'str', 'Str3')]
+
+    caster.sourcetable = (testing_content.VALID_NTRIP
+                          .replace(b'STR;Str3;Str4;B', b'STR;Str3;Str4;C')
+                          .replace(b'NET;Str1', b'NET;New1'))
+    events = [next(watcher) for _ in range(3)]
+    assert [(event.kind, event.table, event.key) for event in events] == [
+        ('modified', 'str', 'Str3'), ('added', 'net', 'New1'), ('removed', 'net', 'Str1')]
+    assert events[0].previous['Format'] == 'B' and events[0].row['Format'] == 'C'
+    assert format_event(events[0]) == "~ STR Str3; Format: 'B' -> 'C'"
+    assert format_event(events[1]._replace(table='cas', key=('host', 2101))) == '+ CAS host:2101'
+
+
+def test_watch_skips_missed_polls(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('ntripbrowser.watch.time.monotonic', lambda: now[0])
+    times = poll_times(10, jitter=0)
+    assert next(times) == 1000
+    now[0] += 1
+    assert next(times) == 1010
+    # the second poll stalls for 35 s, the polls due at 1020, 1030 and 1040 are skipped
+    now[0] = 1045
+    assert next(times) == 1055
+    now[0] = 1056
+    assert next(times) == 1065
+
+
+@pytest.mark.parametrize('seconds', ['0', '-5', 'nan', 'inf', 'soon'])
+def test_cli_rejects_invalid_watch_intervals(monkeypatch, capsys, seconds):
+    monkeypatch.setattr(sys, 'argv', ['ntripbrowser', 'caster', '--watch', seconds])
+    with pytest.raises(SystemExit):
+        browser.main()
+    assert 'seconds must be a positive number' in capsys.readouterr().err
+
+
+def test_async_watch(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+
+    async def watch():
+        watcher = AsyncNtripBrowser(caster.host, caster.port, timeout=2).watch(0.01, jitter=0)
+        first_poll = [await anext(watcher) for _ in range(3)]
+        caster.sourcetable = testing_content.VALID_NTRIP.replace(b'NET;Str1', b'NET;New1')
+        events = [await anext(watcher) for _ in range(2)]
+        await watcher.aclose()
+        return first_poll, events
+
+    first_poll, events = asyncio.run(watch())
+    assert {event.kind for event in first_poll} == {'added'}
+    assert [(event.kind, event.table, event.key) for event in events] == [
+        ('added', 'net', 'New1'), ('removed', 'net', 'Str1')]
+
+
+def test_watch_skips_distance_changes():
+    previous = {'str': [{'Mountpoint': 'A', 'Format': 'B', 'Distance': 1.0}]}
+    current = {'str': [{'Mountpoint': 'A', 'Format': 'B', 'Distance': 2.0}]}
+    assert list(diff_snapshots(take_snapshot(previous), take_snapshot(current))) == []
+
+
+def test_scheduler_derives_timeouts_from_latency():
+    scheduler = CasterScheduler(min_samples=3, percentile=50, factor=2, min_timeout=0.5, max_timeout=10)
+    assert scheduler.timeouts('caster', 2101, 4) == (4, 4)
+    for connect_time, total_time in [(0.1, 1.0), (None, 2.0), (0.2, 1.5), (0.4, 20.0)]:
+        scheduler.record_success('caster', 2101, connect_time, total_time)
+    assert scheduler.timeouts('caster', 2101, 4) == (0.5, 3.0)
+    assert scheduler.timeouts('other', 2101, 4) == (4, 4)
+
+
+def test_scheduler_opens_circuit_after_failures(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('ntripbrowser.scheduler.time.monotonic', lambda: now[0])
+    scheduler = CasterScheduler(failure_threshold=2, backoff=10, max_backoff=25)
+    scheduler.record_failure('caster', 2101)
+    scheduler.check('caster', 2101)
+    scheduler.record_failure('caster', 2101)
+    with pytest.raises(CircuitOpenError):
+        scheduler.check('caster', 2101)
+    now[0] += 10
+    scheduler.check('caster', 2101)
+    scheduler.record_failure('caster', 2101)
+    now[0] += 19
+    with pytest.raises(CircuitOpenError):
+        scheduler.check('caster', 2101)
+    now[0] += 1
+    scheduler.record_failure('caster', 2101)
+    now[0] += 24
+    with pytest.raises(CircuitOpenError):
+        scheduler.check('caster', 2101)
+    scheduler.record_success('caster', 2101, None, 1.0)
+    scheduler.check('caster', 2101)
+
+
+def test_scheduler_lets_one_probe_through(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('ntripbrowser.scheduler.time.monotonic', lambda: now[0])
+    scheduler = CasterScheduler(failure_threshold=1, backoff=10, max_timeout=5)
+    scheduler.record_failure('caster', 2101)
+    now[0] += 10
+    scheduler.check('caster', 2101)
+    with pytest.raises(CircuitOpenError):
+        scheduler.check('caster', 2101)
+    # the outcome of the probe is never recorded
+    now[0] += 5
+    scheduler.check('caster', 2101)
+    with pytest.raises(CircuitOpenError):
+        scheduler.check('caster', 2101)
+    scheduler.record_success('caster', 2101, None, 1.0)
+    scheduler.check('caster', 2101)
+    scheduler.check('caster', 2101)
+
+
+def test_scheduler_records_every_outcome(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr('ntripbrowser.scheduler.time.monotonic', lambda: now[0])
+    scheduler = CasterScheduler(failure_threshold=1, backoff=10)
+    browser = NtripBrowser('caster', 2101, scheduler=scheduler)
+    scheduler.record_failure('caster', 2101)
+    now[0] += 10
+    # a probe answered with an invalid response neither closes nor opens the circuit
+    for error in (NoDataReceivedFromCaster(), ResponseTooLargeError()):
+        scheduler.check('caster', 2101)
+        browser._record_outcome('caster', 2101, None, error)
+        assert scheduler.failures('caster', 2101) == 1
+    # a response served from a cache is a success without latencies
+    scheduler.check('caster', 2101)
+    browser._record_outcome('caster', 2101, namedtuple('Fetcher', 'latency')(None), {'str': []})
+    assert scheduler.failures('caster', 2101) == 0
+    assert scheduler.timeouts('caster', 2101, 4) == (4, 4)
+
+
+def test_scheduler_skips_dead_casters(local_caster):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    dead_caster = local_caster(b'')
+    dead_caster.server_close()
+    scheduler = CasterScheduler(failure_threshold=1)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, scheduler=scheduler)
+    with pytest.raises(UnableToConnect):
+        NtripBrowser(dead_caster.host, dead_caster.port, timeout=2, scheduler=scheduler).get_mountpoints()
+    with pytest.raises(CircuitOpenError):
+        NtripBrowser(dead_caster.host, dead_caster.port, timeout=2, scheduler=scheduler).get_mountpoints()
+
+    results = dict(browser.get_mountpoints_many([(caster.host, caster.port), (dead_caster.host, dead_caster.port)]))
+    assert isinstance(results[(dead_caster.host, dead_caster.port)], CircuitOpenError)
+    assert results[(caster.host, caster.port)]['str']
+    assert scheduler.failures(caster.host, caster.port) == 0
+
+
+def test_fetch_stats_are_reported(local_caster, capsys):
+    caster = local_caster(testing_content.VALID_NTRIP, raw=False)
+    reported = []
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, coordinates=(1, 2), maxdist=100000,
+                           stats_hook=reported.append)
+    browser.get_mountpoints()
+    assert capsys.readouterr().out == ''
+    stats, = reported
+    assert stats is browser.stats
+    assert stats.caster == (caster.host, caster.port) and stats.url == browser.winning_url
+    assert stats.size_download == len(testing_content.VALID_NTRIP)
+    assert 0 < stats.connect_time <= stats.starttransfer_time <= stats.total_time
+    assert set(stats.parse_times) == {'decode', 'parse', 'distance', 'trim', 'export'}
+    assert stats.error is None
+
+    dead_caster = local_caster(b'')
+    dead_caster.server_close()
+    results = dict(browser.get_mountpoints_many([(dead_caster.host, dead_caster.port)]))
+    assert reported[-1].error is results[(dead_caster.host, dead_caster.port)]
+    assert reported[-1].url is None and reported[-1].parse_times == {}
+
+
+@pytest.mark.parametrize('executor_type', [concurrent.futures.ThreadPoolExecutor,
+                                           concurrent.futures.ProcessPoolExecutor])
+def test_get_mountpoints_many_parses_in_executor(local_caster, executor_type):
+    sourcetable = 'SOURCETABLE 200 OK\nSTR;Moskva;Станция;RTCM 3.2;;;;;;55.75;37.62\nENDSOURCETABLE'.encode('cp1251')
+    casters = [local_caster(sourcetable), local_caster(testing_content.VALID_NTRIP)]
+    addresses = [(caster.host, caster.port) for caster in casters]
+    reported = []
+    with executor_type(max_workers=2) as executor:
+        browser = NtripBrowser('localhost', timeout=2, coordinates=(55, 37), parse_executor=executor,
+                               parse_threshold=0, stats_hook=reported.append)
+        results = dict(browser.get_mountpoints_many(addresses))
+    expected = NtripBrowser('localhost', timeout=2, coordinates=(55, 37))
+    assert results == {address: expected._process_raw_data(caster.sourcetable)
+                       for address, caster in zip(addresses, casters)}
+    assert results[addresses[0]]['str'][0]['ID'] == 'Станция'
+    assert browser._caster_encodings == {addresses[0]: 'WINDOWS-1251'}
+    assert all(set(stats.parse_times) >= {'decode', 'parse'} for stats in reported)
+
+
+def test_response_buffer_spills_to_memory_map():
+    buffer = ResponseBuffer(ResponseLimits(spill_size=16))
+    for chunk in (b'SOURCETABLE 200 OK\r\n', testing_content.VALID_NTRIP):
+        assert buffer.write(chunk) is None
+    assert buffer.spilled and buffer.size == len(b'SOURCETABLE 200 OK\r\n') + len(testing_content.VALID_NTRIP)
+    assert buffer.getvalue()[:] == b'SOURCETABLE 200 OK\r\n' + testing_content.VALID_NTRIP
+    buffer.close()
+
+
+def test_response_buffer_aborts_on_limits():
+    limits = ResponseLimits(max_size=64 * 1024, sniff_size=1024)
+    buffer = ResponseBuffer(limits)
+    assert buffer.write(b'\xd3' * 1000) is None
+    assert buffer.write(b'\xd3' * 1000) == 0
+    assert buffer.abort_reason == 'not_sourcetable'
+
+    buffer = ResponseBuffer(limits)
+    assert buffer.write(b'\xd3' * 1000 + b'STR;') is None
+    assert buffer.write(b'\xd3' * 64 * 1024) == 0
+    assert buffer.abort_reason == 'too_large'
+
+
+def test_response_limits(local_caster):
+    rtcm_caster = local_caster(b'\xd3\x00\x13' * 32 * 1024)
+    browser = NtripBrowser(rtcm_caster.host, rtcm_caster.port, timeout=2)
+    # HTTPS urls fail on the plain HTTP caster
+    with pytest.raises(UnableToConnect):
+        browser.get_mountpoints()
+    assert browser._fetcher.urls_processed == browser.urls[:2]
+
+    caster = local_caster(testing_content.VALID_NTRIP)
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, response_limits=ResponseLimits(max_size=100))
+    with pytest.raises(ResponseTooLargeError):
+        browser.get_mountpoints()
+    with pytest.raises(ResponseTooLargeError):
+        list(browser.iter_mountpoints())
+    result, = browser.get_mountpoints_many([(caster.host, caster.port)])
+    assert isinstance(result[1], ResponseTooLargeError)
+
+    browser = NtripBrowser(caster.host, caster.port, timeout=2, response_limits=ResponseLimits(spill_size=100))
+    assert browser.get_mountpoints() == NtripBrowser('localhost')._process_raw_data(testing_content.VALID_NTRIP)